@@ -0,0 +1,37 @@
+#! /usr/bin/env python3
+"""
+Local stand-in for the Gemini `send_prompt` used by the labelling modules.
+
+Recognises the task from the prompt and answers with a well-formed, empty-ish result after a
+simulated latency, so labelling runs end to end without network access or credentials.
+"""
+import json
+import time
+import threading
+
+
+class MockModel:
+    def __init__(self, latency_seconds=0.0, seconds_per_output_char=0.0):
+        self.latency_seconds = latency_seconds
+        self.seconds_per_output_char = seconds_per_output_char
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def respond(self, prompt):
+        if "## Refactored Code:" in prompt:
+            code = json.loads(prompt.split("## Code:\n", 1)[1].split("\n", 1)[0])
+            content = code.get("content", code)
+            return {"refactored_files": [{
+                "filePath": content.get("main_file_path", "Main.java"),
+                "fileContent": content.get("main_file_content", "class Main {}"),
+            }]}
+        if "## Coupling code smells:" in prompt:
+            return {"couplingSmells": []}
+        return {"violations": []}
+
+    def send_prompt(self, messages):
+        with self._lock:
+            self.calls += 1
+        response = self.respond("\n".join(msg["content"] for msg in messages))
+        time.sleep(self.latency_seconds + self.seconds_per_output_char * len(json.dumps(response)))
+        return response
@@ -0,0 +1,176 @@
+#! /usr/bin/env python3
+"""
+End-to-end pipeline benchmark on a synthetic Java corpus.
+
+Times each stage separately: metadata generation, FQN map (cold parse), dependency extraction,
+chunk generation, JSONL writing and labelling against a local mock model. Results are written as
+JSON (with the git commit) so runs can be compared across commits:
+
+    python pipelineBenchmark.py --files 200 --output results/run.json
+    python pipelineBenchmark.py --compare results/before.json results/after.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "results")
+sys.path.append(os.path.join(BASE_DIR, "..", "DatasetPreparation"))
+sys.path.append(os.path.join(BASE_DIR, "..", "DataLableling"))
+
+from syntheticJavaCorpus import CorpusConfig, write_corpus, IMPORT_STYLES
+from mockModel import MockModel
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Timer:
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, name, fn, items=None):
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        count = items(result) if callable(items) else items
+        self.stages[name] = {
+            "seconds": round(seconds, 4),
+            "items": count,
+            "items_per_second": round(count / seconds, 2) if count and seconds else None,
+        }
+        print(f"{name:<22} {seconds:9.3f}s" + (f"  {count} items" if count is not None else ""))
+        return result
+
+
+def run_benchmark(config, workdir, workers=1, model_latency=0.0, label_limit=200):
+    # Isolate the parse-summary cache so the FQN stage measures cold parsing
+    os.environ["AST_CACHE_DIR"] = os.path.join(workdir, "astCache")
+    import generateMetadata
+    import generateInputJson
+    import labellingDetection
+    import labellingRefactoring
+
+    raw_dir = os.path.join(workdir, "raw")
+    cleaned_dir = os.path.join(workdir, "cleaned")
+    out_dir = os.path.join(workdir, "out")
+    os.makedirs(out_dir)
+    corpus = write_corpus(raw_dir, config)
+    timer = Timer()
+
+    metadata = timer.run("generate_metadata", lambda: generateMetadata.process_projects(
+        raw_dir, cleaned_dir, os.path.join(workdir, "metadata.json"), workers), items=corpus["files"])
+
+    project_paths = [str(Path(cleaned_dir) / m["project_id"]) for m in metadata]
+    timer.run("build_fqn_map", lambda: [generateInputJson.build_fqn_map(p) for p in project_paths],
+              items=corpus["files"])
+    all_dependencies = timer.run(
+        "build_dependencies",
+        lambda: {m["project_id"]: generateInputJson.build_dependencies(p) for m, p in zip(metadata, project_paths)},
+        items=corpus["files"])
+
+    chunks = timer.run("generate_chunks", lambda: [
+        chunk
+        for project_id, (m, p) in enumerate(zip(metadata, project_paths))
+        for chunk in generateInputJson.build_project_chunks(project_id, p, all_dependencies[m["project_id"]], cleaned_dir)
+    ], items=len)
+
+    chunks_path = os.path.join(out_dir, "chunks.jsonl")
+    def write_jsonl():
+        with open(chunks_path, "w", encoding="utf-8") as f:
+            generateInputJson.write_chunks(f, chunks)
+    timer.run("write_jsonl", write_jsonl, items=len(chunks))
+
+    # Labelling runs on a prefix of the chunks against the mock model
+    label_path = os.path.join(out_dir, "label_input.jsonl")
+    with open(chunks_path, "r", encoding="utf-8") as f_in, open(label_path, "w", encoding="utf-8") as f_out:
+        for i, line in enumerate(f_in):
+            if i >= label_limit:
+                break
+            f_out.write(line)
+    labelled = min(label_limit, len(chunks))
+
+    model = MockModel(model_latency)
+    labellingDetection.send_prompt = model.send_prompt
+    labellingRefactoring.send_prompt = model.send_prompt
+    solid_path = os.path.join(out_dir, "solid.jsonl")
+    timer.run("label_solid_detection", lambda: labellingDetection.detect_solid_violations(
+        label_path, solid_path, os.path.join(out_dir, "rerun.jsonl")), items=labelled)
+    timer.run("label_coupling_detection", lambda: labellingDetection.detect_coupling(
+        label_path, os.path.join(out_dir, "coupling.jsonl"), os.path.join(out_dir, "rerun.jsonl")), items=labelled)
+    timer.run("label_solid_refactoring", lambda: labellingRefactoring.refactor_solid_violations(
+        solid_path, os.path.join(out_dir, "refactored.jsonl"), os.path.join(out_dir, "rerun.jsonl")), items=labelled)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform()},
+        "config": {**config.to_dict(), "workers": workers, "model_latency": model_latency, "label_limit": label_limit},
+        "corpus": {**corpus, "chunks": len(chunks), "mock_model_calls": model.calls},
+        "stages": timer.stages,
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    if before["config"] != after["config"]:
+        print("Warning: runs used different configurations")
+    print(f"{'stage':<26} {before.get('commit') or 'before':>10} {after.get('commit') or 'after':>10} {'change':>8}")
+    for name, stage in after["stages"].items():
+        old = before["stages"].get(name)
+        if old is None:
+            print(f"{name:<26} {'-':>10} {stage['seconds']:>9.3f}s")
+            continue
+        change = (stage["seconds"] - old["seconds"]) / old["seconds"] if old["seconds"] else 0.0
+        print(f"{name:<26} {old['seconds']:>9.3f}s {stage['seconds']:>9.3f}s {change:>+7.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dataset pipeline on a synthetic corpus.")
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--files", type=int, default=100, help="Files per project.")
+    parser.add_argument("--package-depth", type=int, default=3)
+    parser.add_argument("--import-style", choices=IMPORT_STYLES, default="mixed")
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="generateMetadata worker processes.")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="Mock model seconds per call.")
+    parser.add_argument("--label-limit", type=int, default=200, help="Chunks sent through labelling.")
+    parser.add_argument("--output", help="Result JSON path (default: results/<timestamp>-<commit>.json).")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary working directory.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    config = CorpusConfig(args.projects, args.files, args.package_depth, import_style=args.import_style,
+                          fan_out=args.fan_out, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    try:
+        results = run_benchmark(config, workdir, args.workers, args.model_latency, args.label_limit)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
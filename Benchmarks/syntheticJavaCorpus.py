@@ -0,0 +1,111 @@
+#! /usr/bin/env python3
+"""
+Synthetic Java project generator for benchmarks.
+
+Every project is a Maven module (pom.xml + src/main/java) whose classes reference other classes
+through fields, constructor calls and method calls, so dependency extraction, chunking and the
+coupling pre-filter all have real work to do.
+"""
+import json
+import random
+import argparse
+from pathlib import Path
+
+IMPORT_STYLES = ("explicit", "wildcard", "mixed")
+
+
+class CorpusConfig:
+    def __init__(self, projects=4, files_per_project=100, package_depth=3, packages_per_project=8,
+                 import_style="mixed", fan_out=4, methods_per_class=6, seed=0):
+        if import_style not in IMPORT_STYLES:
+            raise ValueError(f"import_style must be one of {IMPORT_STYLES}")
+        self.projects = projects
+        self.files_per_project = files_per_project
+        self.package_depth = package_depth
+        self.packages_per_project = packages_per_project
+        self.import_style = import_style
+        self.fan_out = fan_out
+        self.methods_per_class = methods_per_class
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _package_names(rng, project, config):
+    packages = []
+    for i in range(config.packages_per_project):
+        middle = [f"p{rng.randint(0, 3)}" for _ in range(max(config.package_depth - 2, 0))]
+        packages.append(".".join(["com", f"bench{project}"] + middle + [f"m{i}"]))
+    return packages
+
+
+def _class_source(rng, config, pkg, name, deps):
+    """deps: list of (package, class name) this class depends on"""
+    imports = []
+    for dep_pkg, dep_name in deps:
+        if dep_pkg == pkg:
+            continue
+        style = config.import_style if config.import_style != "mixed" else rng.choice(("explicit", "wildcard"))
+        imports.append(f"import {dep_pkg}.*;" if style == "wildcard" else f"import {dep_pkg}.{dep_name};")
+
+    lines = [f"package {pkg};", ""] + sorted(set(imports)) + ["import java.util.List;", "import java.util.ArrayList;", ""]
+    lines += ["/**", f" * Synthetic class {name}.", " * ==========================", " */", f"public class {name} {{"]
+    for i, (_, dep_name) in enumerate(deps):
+        lines.append(f"    private {dep_name} dep{i} = new {dep_name}();")
+    lines += ["    private int state;", "    private List<String> items = new ArrayList<>();", ""]
+    for m in range(config.methods_per_class):
+        lines.append(f"    // method {m}")
+        lines.append(f"    public int op{m}(int x) {{")
+        if deps and rng.random() < 0.6:
+            i = rng.randrange(len(deps))
+            if rng.random() < 0.3:
+                lines.append(f"        return dep{i}.self().self().op{m % config.methods_per_class}(x);")
+            else:
+                lines.append(f"        return dep{i}.op{rng.randrange(config.methods_per_class)}(x) + state;")
+        else:
+            lines.append(f"        state += x * {rng.randint(1, 97)};")
+            lines.append(f"        items.add(String.valueOf(state));")
+            lines.append("        return state;")
+        lines.append("    }")
+        lines.append("")
+    lines += [f"    public {name} self() {{", "        return this;", "    }", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_corpus(root, config):
+    """Writes `config.projects` projects under `root`; returns corpus statistics."""
+    rng = random.Random(config.seed)
+    files = total_bytes = 0
+    for p in range(config.projects):
+        project_dir = Path(root) / f"project{p}"
+        (project_dir).mkdir(parents=True, exist_ok=True)
+        (project_dir / "pom.xml").write_text("<project><modelVersion>4.0.0</modelVersion></project>\n")
+
+        packages = _package_names(rng, p, config)
+        classes = [(packages[i % len(packages)], f"C{i}") for i in range(config.files_per_project)]
+        for i, (pkg, name) in enumerate(classes):
+            others = classes[:i] + classes[i + 1:]
+            deps = rng.sample(others, min(config.fan_out, len(others)))
+            source = _class_source(rng, config, pkg, name, deps)
+            file_dir = project_dir / "src" / "main" / "java" / Path(*pkg.split("."))
+            file_dir.mkdir(parents=True, exist_ok=True)
+            (file_dir / f"{name}.java").write_text(source, encoding="utf-8")
+            files += 1
+            total_bytes += len(source)
+    return {"projects": config.projects, "files": files, "bytes": total_bytes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Java corpus.")
+    parser.add_argument("root")
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--package-depth", type=int, default=3)
+    parser.add_argument("--import-style", choices=IMPORT_STYLES, default="mixed")
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config = CorpusConfig(args.projects, args.files, args.package_depth, import_style=args.import_style,
+                          fan_out=args.fan_out, seed=args.seed)
+    print(json.dumps(write_corpus(args.root, config)))
@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+"""
+Static pre-filter for coupling-smell detection.
+
+Uses the structural signals from the AST summary cache to decide, per chunk, which coupling smells
+are even possible. Chunks without any candidate are labelled with an empty smell list instead of
+being sent to the model, and marked `"labelled_by": "prefilter"` so they are never mistaken for
+negatives the model confirmed.
+"""
+import os, sys, json
+import argparse
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+from astSummaryCache import get_summary
+
+# Thresholds are deliberately loose: a missed smell costs more than an extra model call
+MIN_CHAIN_DEPTH = 2          # a.getB().getC()
+MIN_ENVY_FOREIGN = 2         # foreign accesses a method needs before it can envy another class
+MIN_DELEGATION_RATIO = 0.5   # share of a class's methods that only forward a call
+MIN_DELEGATING_METHODS = 1
+PREFILTER_LABEL = "prefilter"
+
+
+def chunk_sources(content):
+    sources = [content.get("main_file_content", "")]
+    sources += [dep.get("file_content", "") for dep in content.get("dependencies", [])]
+    return [code for code in sources if code]
+
+
+def coupling_candidates(content):
+    """Set of smells that could occur in a chunk's content; an empty set means none can."""
+    sources = chunk_sources(content)
+    summaries = [get_summary(code) for code in sources]
+    if not all(s.get("parsed") for s in summaries):
+        # Can't reason about code we can't parse, so let the model look at it
+        return {"Feature Envy", "Inappropriate Intimacy", "Message Chains", "Middle Man"}
+
+    type_count = sum(len(s["types"]) for s in summaries)
+    candidates = set()
+    for s in summaries:
+        signals = s["coupling"]
+        if signals["max_chain_depth"] >= MIN_CHAIN_DEPTH:
+            candidates.add("Message Chains")
+        if any(foreign >= MIN_ENVY_FOREIGN and foreign > own for own, foreign in signals["methods"]):
+            candidates.add("Feature Envy")
+        if any(delegating >= MIN_DELEGATING_METHODS and delegating / methods >= MIN_DELEGATION_RATIO
+               for methods, delegating in signals["classes"] if methods):
+            candidates.add("Middle Man")
+        if type_count > 1 and signals["foreign_field_reads"] > 0:
+            candidates.add("Inappropriate Intimacy")
+    return candidates
+
+
+def evaluate(labelled_path):
+    """
+    Replays the filter over already-labelled coupling data and reports how many model calls it
+    would have saved and how many labelled smells it would have missed.
+    """
+    total = skipped = positives = kept_positives = prefilter_rows = 0
+    smell_total, smell_kept, smell_signalled = Counter(), Counter(), Counter()
+    with open(labelled_path, "r") as f:
+        for line in f:
+            rec = json.loads(line)
+            # Rows the filter itself labelled say nothing about its recall
+            if rec.get("labelled_by") == PREFILTER_LABEL:
+                prefilter_rows += 1
+                continue
+            candidates = coupling_candidates(rec["prompt"])
+            labelled = {s["smell"] for v in rec.get("couplingSmells", []) for s in v.get("smells", [])}
+            total += 1
+            skipped += not candidates
+            if labelled:
+                positives += 1
+                kept_positives += bool(candidates)
+            for smell in labelled:
+                smell_total[smell] += 1
+                smell_kept[smell] += bool(candidates)
+                smell_signalled[smell] += smell in candidates
+
+    report = {
+        "chunks": total,
+        "prefilter_rows_ignored": prefilter_rows,
+        "skipped_calls": skipped,
+        "saved_ratio": skipped / total if total else 0.0,
+        "chunk_recall": kept_positives / positives if positives else 1.0,
+        # Share of labelled smells whose chunk still goes to the model
+        "smell_recall": {smell: smell_kept[smell] / n for smell, n in smell_total.items()},
+        # Share of labelled smells whose own signal fired
+        "signal_recall": {smell: smell_signalled[smell] / n for smell, n in smell_total.items()},
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the coupling pre-filter on labelled data.")
+    parser.add_argument("labelled_path", help="JSONL written by detect_coupling")
+    args = parser.parse_args()
+    evaluate(args.labelled_path)
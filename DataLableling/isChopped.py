@@ -1,29 +1,24 @@
 #! /usr/bin/env python3
 import os, sys, json
-import jpype, jpype.imports
-from jpype.types import JString
-# 1️⃣ Start JVM with JavaParser
-JAR = "libs/javaparser-core-3.25.4.jar"
 
-if not jpype.isJVMStarted():
-    jpype.startJVM(classpath=[JAR])
-
-# 2️⃣ Import JavaParser
-from com.github.javaparser import StaticJavaParser
+# 1️⃣ Generated code is checked with the shared JavaParser service's validate op, which is started
+#    on first use; nothing is summarized or cached, since each refactoring is seen only once
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+from javaParserService import get_client
 
 def is_valid_java_code(code):
-    try:
-        cu = StaticJavaParser.parse(code)
-        return True
-    except Exception as e:
-        # print(f"Error parsing code: {e}")
+    if not isinstance(code, str):
         return False
+    # Unparsable code comes back as False; service failures (socket, spawn, JVM) are raised
+    return get_client().validate([code])[0]
 
 
 def is_valid_code(inputObj):
     files = inputObj.get("refactored_files", [])
-    for f in files:
-        content = f.get("fileContent")
-        if not is_valid_java_code(content):
-            return False
-    return True
\ No newline at end of file
+    contents = [f.get("fileContent") for f in files]
+    if not all(isinstance(content, str) for content in contents):
+        return False
+    if not contents:
+        return True
+    # One request for the whole refactoring instead of one per file
+    return all(get_client().validate(contents))
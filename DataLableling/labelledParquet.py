@@ -0,0 +1,183 @@
+#! /usr/bin/env python3
+"""
+Columnar export of the labelled JSONL datasets.
+
+Every labelled record becomes one Parquet row. `prompt` is stored exactly as the finetuning
+notebooks serialise it (`json.dumps(rec["prompt"])`) and `label` as they serialise the output, so
+readers never re-encode them. Repetitive columns (task, output_schema, size_class, label_field)
+are dictionary-encoded, so the schema string is stored once per row group instead of once per row.
+Labelling runs write rows out of project order (the scheduler longest-first, the pipeline as calls
+finish), so each size class is written sorted by project_id, main file and chunk_id. Sorting goes
+through the files' jsonlIndex offsets, so only offsets are held in memory, and project_id
+statistics then let readers skip row groups.
+
+    python labelledParquet.py export solid.parquet medium=mediumSolid.jsonl large=largeSolid.jsonl
+    python labelledParquet.py read solid.parquet --project 140 --size medium
+"""
+import os, sys, json
+import heapq
+import argparse
+from contextlib import ExitStack
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+from tokenEstimator import load_estimator
+from jsonlIndex import IndexedJsonl
+
+ESTIMATOR = load_estimator()
+ROW_GROUP_SIZE = 2048
+SIZE_CLASSES = ("small", "medium", "large")
+LABEL_FIELDS = ("violations", "couplingSmells", "refactored_files")
+DICTIONARY_COLUMNS = ["size_class", "task", "output_schema", "label_field", "labelled_by"]
+KEY_COLUMNS = ["project_id", "chunk_id", "size_class", "task", "main_file_path", "labelled_by", "label_count",
+               "prompt_tokens", "label_tokens"]
+
+SCHEMA = pa.schema([
+    ("project_id", pa.int64()),
+    ("chunk_id", pa.int64()),
+    ("size_class", pa.dictionary(pa.int8(), pa.string())),
+    ("task", pa.dictionary(pa.int8(), pa.string())),
+    ("output_schema", pa.dictionary(pa.int8(), pa.string())),
+    ("main_file_path", pa.string()),
+    ("prompt", pa.large_string()),
+    ("label_field", pa.dictionary(pa.int8(), pa.string())),
+    ("label", pa.large_string()),
+    ("labelled_by", pa.dictionary(pa.int8(), pa.string())),
+    ("label_count", pa.int32()),
+    ("prompt_tokens", pa.int32()),
+    ("label_tokens", pa.int32()),
+])
+
+
+def label_field(rec):
+    for field in LABEL_FIELDS:
+        if field in rec:
+            return field
+    return None
+
+
+def main_file_path(prompt):
+    # Detection prompts are the chunk content; refactoring prompts nest it under "code"
+    content = prompt.get("code", prompt) if isinstance(prompt, dict) else {}
+    return content.get("main_file_path") if isinstance(content, dict) else None
+
+
+def to_row(rec, size_class, count_tokens=None):
+    field = label_field(rec)
+    labels = rec.get(field, []) if field else []
+    prompt = json.dumps(rec["prompt"])
+    label = json.dumps(labels, ensure_ascii=False, default=str)
+    if count_tokens:
+        prompt_tokens, label_tokens = count_tokens([prompt, label])
+    else:
+        prompt_tokens, label_tokens = ESTIMATOR.estimate(prompt), ESTIMATOR.estimate(label)
+    return {
+        "project_id": rec["project_id"],
+        "chunk_id": rec["chunk_id"],
+        "size_class": size_class,
+        "task": rec.get("task"),
+        "output_schema": rec.get("output_schema"),
+        "main_file_path": main_file_path(rec["prompt"]),
+        "prompt": prompt,
+        "label_field": field,
+        "label": label,
+        # "prefilter" rows were labelled empty without a model call (see couplingPrefilter.py)
+        "labelled_by": rec.get("labelled_by", "model"),
+        "label_count": len(labels) if isinstance(labels, list) else None,
+        "prompt_tokens": prompt_tokens,
+        "label_tokens": label_tokens,
+    }
+
+
+def infer_size_class(path):
+    name = os.path.basename(path).lower()
+    return next((size for size in SIZE_CLASSES if name.startswith(size)), None)
+
+
+def iter_by_project(paths):
+    """Raw lines of `paths` merged into (project_id, main file, chunk_id) order"""
+    with ExitStack() as stack:
+        indexes = [stack.enter_context(IndexedJsonl(path)) for path in paths]
+        for _, line in heapq.merge(*(index.iter_raw() for index in indexes), key=lambda item: item[0]):
+            yield line
+
+
+def export_parquet(inputs, output_path, count_tokens=None, row_group_size=ROW_GROUP_SIZE):
+    """
+    Streams `inputs` ([(jsonl_path, size_class)]) into one Parquet file, `row_group_size` rows at a
+    time, grouped by size class and sorted by project within each. `count_tokens(texts)` gives
+    exact counts; by default they are byte-based estimates.
+    """
+    writer = pq.ParquetWriter(output_path, SCHEMA, compression="zstd", use_dictionary=DICTIONARY_COLUMNS,
+                              write_statistics=True)
+    rows, total = [], 0
+
+    def flush():
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), row_group_size=row_group_size)
+            rows.clear()
+
+    by_size_class = {}
+    for path, size_class in inputs:
+        by_size_class.setdefault(size_class, []).append(path)
+
+    try:
+        for size_class, paths in by_size_class.items():
+            for line in iter_by_project(paths):
+                rows.append(to_row(json.loads(line), size_class, count_tokens))
+                total += 1
+                if len(rows) >= row_group_size:
+                    flush()
+            # Row groups never mix size classes, so size filters prune whole groups
+            flush()
+    finally:
+        writer.close()
+    return total
+
+
+def read_labelled(path, projects=None, size_classes=None, columns=None):
+    """
+    Reads the export as an Arrow table. Filters on project_id and size_class are applied with
+    row-group statistics, and only `columns` are decoded (all by default).
+    """
+    filters = []
+    if projects is not None:
+        filters.append(("project_id", "in", list(projects)))
+    if size_classes is not None:
+        filters.append(("size_class", "in", list(size_classes)))
+    return pq.read_table(path, columns=columns, filters=filters or None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export labelled JSONL to Parquet, or read an export back.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export")
+    export.add_argument("output")
+    export.add_argument("inputs", nargs="+", help="[size=]path.jsonl; the size class is inferred from the file name otherwise.")
+    export.add_argument("--exact", action="store_true", help="Count tokens with cl100k_base instead of estimating.")
+    read = sub.add_parser("read")
+    read.add_argument("path")
+    read.add_argument("--project", type=int, action="append")
+    read.add_argument("--size", action="append", choices=SIZE_CLASSES)
+    read.add_argument("--columns", nargs="+", default=KEY_COLUMNS)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        inputs = []
+        for item in args.inputs:
+            size, sep, path = item.partition("=")
+            inputs.append((path, size) if sep else (item, infer_size_class(item)))
+        count_tokens = None
+        if args.exact:
+            from generateMetadata import count_tokens_batch as count_tokens
+        total = export_parquet(inputs, args.output, count_tokens)
+        jsonl_bytes = sum(os.path.getsize(path) for path, _ in inputs)
+        parquet_bytes = os.path.getsize(args.output)
+        print(f"{total} records: {jsonl_bytes / 1e6:.1f} MB JSONL -> {parquet_bytes / 1e6:.1f} MB Parquet "
+              f"({parquet_bytes / jsonl_bytes:.0%})" if jsonl_bytes else f"{total} records")
+    else:
+        table = read_labelled(args.path, args.project, args.size, args.columns)
+        for row in table.to_pylist():
+            print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+"""
+Offline batch mode for the labelling scripts.
+
+`write_batch_requests` turns an input JSONL into a provider batch-request file (one Gemini
+`GenerateContentRequest` per line, keyed by the record's identity). Once the provider has run the
+job, `iter_batch_results` joins the results file back to the input records so the labelling
+modules can apply their usual post-processing. Inputs may hold rerun rows appended for a chunk
+already in the file; the last line of each record is the one sent and joined.
+
+Fixtures for a local round trip (no provider involved) are in tests/fixtures.
+"""
+import json
+
+
+def record_id(data):
+    """
+    Identity of one chunk record. `chunk_id` restarts at 0 for every main file, so the main file
+    path is part of it. Detection inputs carry the chunk under "content", labelled records under
+    "prompt" (nested in "code" for refactoring outputs).
+    """
+    content = data.get("content") or data.get("prompt") or {}
+    content = content.get("code", content)
+    return f"{data['project_id']}:{content.get('main_file_path')}:{data['chunk_id']}"
+
+
+def _camel(name):
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def to_request_config(config):
+    """snake_case SDK config (as passed to GenerateContentConfig) -> camelCase REST config"""
+    return {_camel(k): to_request_config(v) if isinstance(v, dict) else v for k, v in config.items()}
+
+
+def to_batch_request(messages, generation_config):
+    return {
+        "contents": [{"role": msg["role"], "parts": [{"text": msg["content"]}]} for msg in messages],
+        "generationConfig": to_request_config(generation_config),
+    }
+
+
+def iter_latest(input_path):
+    """
+    Yields (data, line) for every record of the input, once: reruns are appended, so a later line
+    for the same record supersedes the earlier ones.
+    """
+    last = {}
+    with open(input_path, "r") as f_in:
+        for line_number, line in enumerate(f_in, 1):
+            last[record_id(json.loads(line))] = line_number
+    with open(input_path, "r") as f_in:
+        for line_number, line in enumerate(f_in, 1):
+            data = json.loads(line)
+            if last[record_id(data)] == line_number:
+                yield data, line
+
+
+def write_batch_requests(input_path, batch_path, build_messages, generation_config, skip=None):
+    """
+    Writes one batch request per input record (its last line, see `iter_latest`); `skip(data)`
+    leaves records out of the batch.
+    """
+    written = 0
+    with open(batch_path, "w", encoding="utf-8") as f_out:
+        for data, line in iter_latest(input_path):
+            if skip and skip(data):
+                continue
+            key = record_id(data)
+            request = to_batch_request(build_messages(data), generation_config)
+            f_out.write(json.dumps({"key": key, "request": request}, ensure_ascii=False) + "\n")
+            written += 1
+    print(f"{written} batch requests written to {batch_path}.")
+    return written
+
+
+def response_text(response):
+    """Concatenated text of the first candidate, or None if the request failed or was blocked"""
+    candidates = (response or {}).get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+    return text or None
+
+
+def load_batch_results(results_path):
+    results = {}
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            key = rec.get("key") or (rec.get("request") or {}).get("key")
+            results[key] = None if rec.get("error") else response_text(rec.get("response"))
+    return results
+
+
+def iter_batch_results(input_path, results_path):
+    """Yields (data, line, text) for every input record; text is None when there is no usable result."""
+    results = load_batch_results(results_path)
+    for data, line in iter_latest(input_path):
+        yield data, line, results.get(record_id(data))
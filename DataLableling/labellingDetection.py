@@ -21,6 +21,11 @@ import json_repair
 from google import genai
 from google.genai import types
 import os
+from couplingPrefilter import coupling_candidates, PREFILTER_LABEL
+from labellingBatch import write_batch_requests, iter_batch_results
+from labellingScheduler import build_work, labelled_ids, run_schedule, SynchronizedWriter, TOKENS_PER_MINUTE
+import pipelineMetrics as metrics
+import localModelClient
 
 
 Principle = Literal[
@@ -70,6 +75,12 @@ class CouplingDetectionOutput(BaseModel):
 
 
 def parse_json(text):
+    try:
+        return json.loads(text)
+    except:
+        pass
+    # Only malformed or fenced responses go through the slower repair path
+    metrics.incr("json.repair_hits")
     try:
         return json_repair.loads(text)
     except:
@@ -77,19 +88,29 @@ def parse_json(text):
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "my-service-account.json"
 
-# Initialize Gemini client globally for reuse
-genai_client = genai.Client(
-    vertexai=True,
-    project="abiding-circle-461421-a8",
-    location="global"
+MODEL_NAME = "gemini-2.5-flash-preview-05-20"
+GENERATION_CONFIG = dict(
+    temperature=1,
+    top_p=1,
+    seed=0,
+    max_output_tokens=8192,
 )
 
-MODEL_NAME = "gemini-2.5-flash-preview-05-20"
+genai_client = None
 
-def send_prompt(messages):
-    """
-    Sends prompt to Gemini model and returns parsed JSON response
-    """
+
+def get_genai_client():
+    """Creates the Gemini client on first use and reuses it afterwards"""
+    global genai_client
+    if genai_client is None:
+        genai_client = genai.Client(
+            vertexai=True,
+            project="abiding-circle-461421-a8",
+            location="global"
+        )
+    return genai_client
+
+def gemini_generate(messages):
     # Convert OpenAI-style messages to Gemini format
     contents = []
     for msg in messages:
@@ -97,32 +118,45 @@ def send_prompt(messages):
         contents.append(types.Content(role=msg["role"], parts=parts))
 
     config = types.GenerateContentConfig(
-        temperature=1,
-        top_p=1,
-        seed=0,
-        max_output_tokens=8192,
+        **GENERATION_CONFIG,
         safety_settings=[],
     )
 
-    try:
-        chunks = genai_client.models.generate_content_stream(
-            model=MODEL_NAME,
-            contents=contents,
-            config=config,
-        )
-        full_response = ""
-        for chunk in chunks:
-            if chunk.text:
-                full_response += chunk.text
+    chunks = get_genai_client().models.generate_content_stream(
+        model=MODEL_NAME,
+        contents=contents,
+        config=config,
+    )
+    full_response = ""
+    for chunk in chunks:
+        if chunk.text:
+            full_response += chunk.text
+    return full_response
+
 
+def send_prompt(messages):
+    """
+    Sends prompt to Gemini model (or the local model server, when configured) and returns parsed JSON response
+    """
+    try:
+        metrics.incr("model.calls")
+        with metrics.timer("model.latency_seconds"):
+            if localModelClient.SERVER_URL:
+                full_response = localModelClient.generate(messages)
+            else:
+                full_response = gemini_generate(messages)
+
+        metrics.observe("model.output_chars", len(full_response or ""))
         parsed = parse_json(full_response)
         if parsed:
             return parsed
         else:
+            metrics.incr("model.unparsed_responses")
             print("Failed to parse Gemini response")
             return None
 
     except Exception as e:
+        metrics.incr("model.errors")
         print("Gemini API Error:", str(e))
         return None
 
@@ -130,132 +164,250 @@ def send_prompt(messages):
 
 """## Prompt Generator"""
 
+def solid_detection_messages(data):
+    return [
+        {
+            "role": "user",
+            "content": "\n".join([
+                "You are a senior software engineer.",
+                "You will be given one file with its file dependencies.",
+                "Your task is to detect violations of SOLID principles: Single Responsibility, Open/Closed, Liskov Substitution, Interface Segregation, and Dependency Inversion.",
+                "",
+                "Principle definitions (apply these strictly):",
+                "SRP: A class has exactly one reason to change—only one responsibility.",
+                "OCP: A class may be extended without modifying its existing code.",
+                "LSP: Subtypes must behave interchangeably with their base types.",
+                "ISP: Clients should only depend on the methods they actually use.",
+                "DIP: High‑level (policy/business) modules must depend on abstractions (interfaces/abstract classes), not on concrete (implementation) classes. Low‑level modules must implement those abstractions; they should NOT be directly referenced by high‑level modules.",
+                "Don't include the usage of built in classes (e.g. java.util.Scanner, java.lang.String, List, Map), they don't break DIP",
+                "",
+                "Apply a step-by-step reasoning process to identify any violations.",
+                "Start by explaining what each principle means in the current context, and how the code complies or fails to comply with it.",
+                "",
+                "After providing your first assessment, re-evaluate your findings and refine your judgment if necessary.",
+                "",
+                "Finally, reflect on your answer: did you miss anything? Could your answer be improved? If so, revise accordingly.",
+                "",
+                "Always respond in a structured JSON format. Do not include any explanation outside the JSON.",
+                "You have to extract SOLID Violations from Code according the Pydantic details.",
+                "Be objective and thorough, even if no violations are found.",
+                "Do not generate any introduction or conclusion."
+                "## Code:",
+                json.dumps(data["content"], ensure_ascii=False),
+                "",
+
+                "## Pydantic Details:",
+                json.dumps(
+                    SolidDetectionOutput.model_json_schema(), ensure_ascii=False
+                ),
+                "",
+                "## SOLID Violations:",
+                "json"
+            ])
+        }
+    ]
+
+
+def solid_detection_result(data, violations):
+    return {
+        "project_id": data["project_id"],
+        "chunk_id": data["chunk_id"],
+        "prompt": data["content"],
+        "task": "SOLID Violations Detection",
+        "output_schema": json.dumps(SolidDetectionOutput.model_json_schema(), ensure_ascii=False),
+        "violations": violations
+    }
+
+
+def label_solid_violations(data, line, f_out, unparsed_f_out):
+    response = send_prompt(solid_detection_messages(data))
+
+    if not response:
+        unparsed_f_out.write(line)
+        return
+    violations = response.get("violations", [])
+    result = solid_detection_result(data, violations)
+    f_out.write(json.dumps(result) + "\n")
+    print(response)
+
+
 def detect_solid_violations(input_path, output_path, unparsed_path):
     with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
         for line_num, line in enumerate(f_in, 1):
             data = json.loads(line)
+            label_solid_violations(data, line, f_out, unparsed_f_out)
+
+
+def coupling_detection_messages(data):
+    return [
+        {
+            "role": "user",
+            "content": "\n".join([
+                "You are a software engineer.",
+                "You will be given one file with its file dependencies.",
+                "Your task is to identify and explain any of the following coupling smells:",
+                "",
+                "- Feature Envy: A method that seems more interested in another class than the one it is in, accessing its data and methods frequently.",
+                "- Inappropriate Intimacy: Two classes that share too much information or access each other's internal details excessively.",
+                "- Incomplete Library Class: A library class is missing functionality that should be there, forcing users to add methods or subclasses that break encapsulation.",
+                "- Message Chains: A client asks one object for another object, then that object for another, and so on, forming a long chain of calls.",
+                "- Middle Man: A class that delegates almost everything to another class and does very little itself.",
+                "",
+                "Use a step-by-step reasoning process (Chain of Thought) to evaluate if any of these smells exist in the code.",
+                "For each suspected smell, explain what triggered it, and which class/method is involved.",
+                "",
+                "After your first pass, review your analysis and refine it if necessary.",
+                "Then, critically evaluate your final result.",
+                "- Did you miss any smell?",
+                "- Did you misclassify anything?",
+                "- Could your reasoning be more precise?",
+                "",
+                "Always respond in a structured JSON format. Do not include any explanation outside the JSON.",
+                "You have to extract Coupling code smells from Code according the Pydantic details.",
+                "Be objective and thorough, even if no violations are found.",
+                "Do not generate any introduction or conclusion.",
+                "## Code:",
+                json.dumps(data["content"], ensure_ascii=False),
+                "",
+                "## Pydantic Details:",
+                json.dumps(CouplingDetectionOutput.model_json_schema(), ensure_ascii=False),
+                "",
+                "## Coupling code smells:",
+                "json"
+            ])
+        }
+    ]
+
+
+def coupling_result(data, smells, labelled_by="model"):
+    """`labelled_by` is "prefilter" for chunks labelled empty without calling the model"""
+    return {
+        "project_id": data["project_id"],
+        "chunk_id": data["chunk_id"],
+        "prompt": data["content"],
+        "task": "Coupling Smells Detection",
+        "output_schema": json.dumps(CouplingDetectionOutput.model_json_schema(),
+                                    ensure_ascii=False),
+        "couplingSmells": smells,
+        "labelled_by": labelled_by
+    }
+
+
+def label_coupling(data, line, f_out, unparsed_f_out):
+    response = send_prompt(coupling_detection_messages(data))
+
+    if not response:
+        unparsed_f_out.write(line)
+        return
+    smells = response.get("couplingSmells", [])
+
+    result = coupling_result(data, smells)
+    f_out.write(json.dumps(result) + "\n")
+    print(response)
+
+
+def detect_coupling(input_path, output_path, unparsed_path, prefilter=True):
+    skipped = total = 0
+    with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        for line in f_in:
+            data = json.loads(line)
+            total += 1
+
+            # No structural candidate for any smell: label it empty without calling the model
+            if prefilter and not coupling_candidates(data["content"]):
+                skipped += 1
+                f_out.write(json.dumps(coupling_result(data, [], PREFILTER_LABEL)) + "\n")
+                continue
+
+            label_coupling(data, line, f_out, unparsed_f_out)
+
+    print(f"Pre-filter skipped {skipped} of {total} chunks without coupling candidates.")
+
 
-            solid_violations_detection_messages = [
-                {
-                    "role": "user",
-                    "content": "\n".join([
-                        "You are a senior software engineer.",
-                        "You will be given one file with its file dependencies.",
-                        "Your task is to detect violations of SOLID principles: Single Responsibility, Open/Closed, Liskov Substitution, Interface Segregation, and Dependency Inversion.",
-                        "",
-                        "Principle definitions (apply these strictly):",
-                        "SRP: A class has exactly one reason to change—only one responsibility.",
-                        "OCP: A class may be extended without modifying its existing code.",
-                        "LSP: Subtypes must behave interchangeably with their base types.",
-                        "ISP: Clients should only depend on the methods they actually use.",
-                        "DIP: High‑level (policy/business) modules must depend on abstractions (interfaces/abstract classes), not on concrete (implementation) classes. Low‑level modules must implement those abstractions; they should NOT be directly referenced by high‑level modules.",
-                        "Don't include the usage of built in classes (e.g. java.util.Scanner, java.lang.String, List, Map), they don't break DIP",
-                        "",
-                        "Apply a step-by-step reasoning process to identify any violations.",
-                        "Start by explaining what each principle means in the current context, and how the code complies or fails to comply with it.",
-                        "",
-                        "After providing your first assessment, re-evaluate your findings and refine your judgment if necessary.",
-                        "",
-                        "Finally, reflect on your answer: did you miss anything? Could your answer be improved? If so, revise accordingly.",
-                        "",
-                        "Always respond in a structured JSON format. Do not include any explanation outside the JSON.",
-                        "You have to extract SOLID Violations from Code according the Pydantic details.",
-                        "Be objective and thorough, even if no violations are found.",
-                        "Do not generate any introduction or conclusion."
-                        "## Code:",
-                        json.dumps(data["content"], ensure_ascii=False),
-                        "",
-
-                        "## Pydantic Details:",
-                        json.dumps(
-                            SolidDetectionOutput.model_json_schema(), ensure_ascii=False
-                        ),
-                        "",
-                        "## SOLID Violations:",
-                        "json"
-                    ])
-                }
-            ]
-
-            response = send_prompt(solid_violations_detection_messages)
+"""## Scheduled Mode"""
 
+# Detection answers are short lists of findings, largely independent of the input length
+DETECTION_OUTPUT_TOKENS = 1000
+
+
+def detection_output_tokens(data, prompt_tokens):
+    return DETECTION_OUTPUT_TOKENS
+
+
+def detect_solid_violations_scheduled(input_path, output_path, unparsed_path, rerun_path=None,
+                                      workers=8, tokens_per_minute=TOKENS_PER_MINUTE):
+    """
+    Same labelling as detect_solid_violations, but reruns first and longest chunks first across
+    `workers` concurrent requests that share a per-minute token budget. Chunks already in the
+    output are not labelled again.
+    """
+    work = build_work(input_path, solid_detection_messages, detection_output_tokens, rerun_path,
+                      labelled_ids(output_path))
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        f_out, unparsed_f_out = SynchronizedWriter(f_out), SynchronizedWriter(unparsed_f_out)
+        run_schedule(work, lambda item: label_solid_violations(item.data, item.line, f_out, unparsed_f_out),
+                     workers, tokens_per_minute, lambda item, e: unparsed_f_out.write(item.line))
+
+
+def detect_coupling_scheduled(input_path, output_path, unparsed_path, rerun_path=None, prefilter=True,
+                              workers=8, tokens_per_minute=TOKENS_PER_MINUTE):
+    # Without the pre-filter, chunks it labelled earlier go to the model after all
+    keep = None if prefilter else (lambda rec: rec.get("labelled_by") != PREFILTER_LABEL)
+    work = build_work(input_path, coupling_detection_messages, detection_output_tokens, rerun_path,
+                      labelled_ids(output_path, keep))
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        if prefilter:
+            remaining = []
+            for item in work:
+                if coupling_candidates(item.data["content"]):
+                    remaining.append(item)
+                else:
+                    f_out.write(json.dumps(coupling_result(item.data, [], PREFILTER_LABEL)) + "\n")
+            work = remaining
+        f_out, unparsed_f_out = SynchronizedWriter(f_out), SynchronizedWriter(unparsed_f_out)
+        run_schedule(work, lambda item: label_coupling(item.data, item.line, f_out, unparsed_f_out),
+                     workers, tokens_per_minute, lambda item, e: unparsed_f_out.write(item.line))
+
+
+"""## Batch Mode"""
+
+def write_solid_violations_batch(input_path, batch_path):
+    return write_batch_requests(input_path, batch_path, solid_detection_messages, GENERATION_CONFIG)
+
+
+def ingest_solid_violations_batch(input_path, results_path, output_path, unparsed_path):
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        for data, line, text in iter_batch_results(input_path, results_path):
+            response = parse_json(text) if text else None
             if not response:
                 unparsed_f_out.write(line)
                 continue
-            violations = response.get("violations", [])
-            result = {
-                "project_id": data["project_id"],
-                "chunk_id": data["chunk_id"],
-                "prompt": data["content"],
-                "task": "SOLID Violations Detection",
-                "output_schema": json.dumps(SolidDetectionOutput.model_json_schema(), ensure_ascii=False),
-                "violations": violations
-            }
-            f_out.write(json.dumps(result) + "\n")
-            print(response)
-
-def detect_coupling(input_path, output_path, unparsed_path):
-    with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
-        for line in f_in:
-            data = json.loads(line)
-            coupling_smells_detection_messages = [
-                {
-                    "role": "user",
-                    "content": "\n".join([
-                        "You are a software engineer.",
-                        "You will be given one file with its file dependencies.",
-                        "Your task is to identify and explain any of the following coupling smells:",
-                        "",
-                        "- Feature Envy: A method that seems more interested in another class than the one it is in, accessing its data and methods frequently.",
-                        "- Inappropriate Intimacy: Two classes that share too much information or access each other's internal details excessively.",
-                        "- Incomplete Library Class: A library class is missing functionality that should be there, forcing users to add methods or subclasses that break encapsulation.",
-                        "- Message Chains: A client asks one object for another object, then that object for another, and so on, forming a long chain of calls.",
-                        "- Middle Man: A class that delegates almost everything to another class and does very little itself.",
-                        "",
-                        "Use a step-by-step reasoning process (Chain of Thought) to evaluate if any of these smells exist in the code.",
-                        "For each suspected smell, explain what triggered it, and which class/method is involved.",
-                        "",
-                        "After your first pass, review your analysis and refine it if necessary.",
-                        "Then, critically evaluate your final result.",
-                        "- Did you miss any smell?",
-                        "- Did you misclassify anything?",
-                        "- Could your reasoning be more precise?",
-                        "",
-                        "Always respond in a structured JSON format. Do not include any explanation outside the JSON.",
-                        "You have to extract Coupling code smells from Code according the Pydantic details.",
-                        "Be objective and thorough, even if no violations are found.",
-                        "Do not generate any introduction or conclusion.",
-                        "## Code:",
-                        json.dumps(data["content"], ensure_ascii=False),
-                        "",
-                        "## Pydantic Details:",
-                        json.dumps(CouplingDetectionOutput.model_json_schema(), ensure_ascii=False),
-                        "",
-                        "## Coupling code smells:",
-                        "json"
-                    ])
-                }
-            ]
-
-            response = send_prompt(coupling_smells_detection_messages)
+            f_out.write(json.dumps(solid_detection_result(data, response.get("violations", []))) + "\n")
+
+
+def write_coupling_batch(input_path, batch_path, prefilter=True):
+    skip = (lambda data: not coupling_candidates(data["content"])) if prefilter else None
+    return write_batch_requests(input_path, batch_path, coupling_detection_messages, GENERATION_CONFIG, skip)
 
+
+def ingest_coupling_batch(input_path, results_path, output_path, unparsed_path, prefilter=True):
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        for data, line, text in iter_batch_results(input_path, results_path):
+            # Chunks the pre-filter kept out of the batch are labelled empty, as in detect_coupling
+            if prefilter and not coupling_candidates(data["content"]):
+                f_out.write(json.dumps(coupling_result(data, [], PREFILTER_LABEL)) + "\n")
+                continue
+            response = parse_json(text) if text else None
             if not response:
                 unparsed_f_out.write(line)
                 continue
-            smells = response.get("couplingSmells", [])
-
-            result = {
-                "project_id": data["project_id"],
-                "chunk_id": data["chunk_id"],
-                "prompt": data["content"],
-                "task": "Coupling Smells Detection",
-                "output_schema": json.dumps(CouplingDetectionOutput.model_json_schema(),
-                                            ensure_ascii=False),
-                "couplingSmells": smells
-            }
-            f_out.write(json.dumps(result) + "\n")
-            print(response)
-
-
-detect_solid_violations("medium.jsonl", "testResult.jsonl", "rerun.jsonl")
-# detect_coupling("medium.jsonl", "mediumLabelledCoupling.jsonl", "rerun.jsonl")
\ No newline at end of file
+            f_out.write(json.dumps(coupling_result(data, response.get("couplingSmells", []))) + "\n")
+
+
+if __name__ == "__main__":
+    detect_solid_violations("medium.jsonl", "testResult.jsonl", "rerun.jsonl")
+    # detect_coupling("medium.jsonl", "mediumLabelledCoupling.jsonl", "rerun.jsonl")
+
+    # Batch mode: write the request file, submit it to the provider, then ingest its results file
+    # write_solid_violations_batch("medium.jsonl", "solidBatchRequests.jsonl")
+    # ingest_solid_violations_batch("medium.jsonl", "solidBatchResults.jsonl", "testResult.jsonl", "rerun.jsonl")
@@ -0,0 +1,131 @@
+#! /usr/bin/env python3
+"""
+Staged producer/consumer pipeline.
+
+Each stage runs its function on its own pool of threads and hands results to the next stage
+through a bounded queue, so a slow stage applies backpressure instead of letting work pile up
+in memory, and fast stages never wait on each other's I/O.
+"""
+import os, sys
+import time
+import queue
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+import pipelineMetrics as metrics
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1, queue_size=32):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.wait_in_seconds = 0.0   # idle, waiting for input
+        self.wait_out_seconds = 0.0  # blocked on a full downstream queue
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed):
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "errors": self.errors,
+            "items_per_second": self.processed / elapsed if elapsed else 0.0,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilisation": self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            "wait_input_seconds": round(self.wait_in_seconds, 3),
+            "wait_output_seconds": round(self.wait_out_seconds, 3),
+        }
+
+
+def _run_stage(stage, inbox, outbox, on_error=None, fatal=(), failures=None):
+    while True:
+        t0 = time.perf_counter()
+        item = inbox.get()
+        t1 = time.perf_counter()
+        if item is _DONE:
+            with stage._lock:
+                stage.wait_in_seconds += t1 - t0
+            return
+        if failures:
+            continue
+        try:
+            result = stage.fn(item)
+        except fatal as e:
+            # Every later item would fail the same way; drain the queues and let run_pipeline raise
+            print(f"[{stage.name}] stopping the pipeline: {type(e).__name__}: {e}")
+            failures.append(e)
+            continue
+        except Exception as e:
+            # A failing item must not take its worker down and stall the pipeline
+            print(f"[{stage.name}] {type(e).__name__}: {e}")
+            result = None
+            with stage._lock:
+                stage.errors += 1
+            if on_error is not None:
+                try:
+                    on_error(stage.name, item, e)
+                except Exception as sink_error:
+                    print(f"[{stage.name}] error sink failed: {type(sink_error).__name__}: {sink_error}")
+        t2 = time.perf_counter()
+        metrics.observe(f"pipeline.{stage.name}.item_seconds", t2 - t1)
+        if outbox is not None and result is not None:
+            outbox.put(result)
+        t3 = time.perf_counter()
+        with stage._lock:
+            stage.processed += 1
+            stage.wait_in_seconds += t1 - t0
+            stage.busy_seconds += t2 - t1
+            stage.wait_out_seconds += t3 - t2
+
+
+def run_pipeline(source, stages, on_error=None, fatal=()):
+    """
+    Feeds every item of `source` through `stages` in order. A stage function returning None
+    drops the item. An item whose stage raises is handed to `on_error(stage_name, item, exc)`
+    (from that stage's worker thread) so it can be recorded for a rerun. An exception of a type in
+    `fatal` stops the pipeline instead: remaining items are dropped and it is raised once every
+    stage has shut down. Returns per-stage throughput counters.
+    """
+    queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    failures = []
+    start = time.perf_counter()
+
+    threads = []
+    for i, stage in enumerate(stages):
+        outbox = queues[i + 1] if i + 1 < len(stages) else None
+        pool = [threading.Thread(target=_run_stage, daemon=True,
+                                 args=(stage, queues[i], outbox, on_error, fatal, failures))
+                for _ in range(stage.workers)]
+        for t in pool:
+            t.start()
+        threads.append(pool)
+
+    for item in source:
+        if failures:
+            break
+        queues[0].put(item)
+
+    # Shut stages down front to back: once a stage's workers have all exited, nothing more
+    # can reach the next queue
+    for i, stage in enumerate(stages):
+        for _ in range(stage.workers):
+            queues[i].put(_DONE)
+        for t in threads[i]:
+            t.join()
+
+    elapsed = time.perf_counter() - start
+    stats = {"elapsed_seconds": round(elapsed, 3), "stages": {s.name: s.stats(elapsed) for s in stages}}
+    for s in stages:
+        st = stats["stages"][s.name]
+        print(f"[{s.name}] {st['processed']} items, {st['items_per_second']:.2f}/s, "
+              f"utilisation {st['utilisation']:.0%}, waited {st['wait_input_seconds']}s for input, "
+              f"{st['wait_output_seconds']}s on downstream")
+    if failures:
+        raise failures[0]
+    return stats
@@ -7,6 +7,12 @@ from google.genai import types
 import os
 from isChopped import is_valid_code
 from isValidJson import is_valid_obj
+from labellingBatch import write_batch_requests, iter_batch_results, record_id
+from labellingScheduler import build_work, labelled_ids, run_schedule, SynchronizedWriter, TOKENS_PER_MINUTE
+from labellingPipeline import Stage, run_pipeline
+import pipelineMetrics as metrics
+from javaParserService import ParserUnavailable
+import localModelClient
 
 
 class RefactoredFile(BaseModel):
@@ -18,6 +24,12 @@ class RefactoringOutput(BaseModel):
 
 
 def parse_json(text):
+    try:
+        return json.loads(text)
+    except:
+        pass
+    # Only malformed or fenced responses go through the slower repair path
+    metrics.incr("json.repair_hits")
     try:
         return json_repair.loads(text)
     except:
@@ -25,212 +37,414 @@ def parse_json(text):
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "my-service-account.json"
 
-genai_client = genai.Client(
-    vertexai=True,
-    project="abiding-circle-461421-a8",
-    location="global"
+MODEL_NAME = "gemini-2.5-flash-preview-05-20"
+GENERATION_CONFIG = dict(
+    temperature=1,
+    top_p=1,
+    seed=0,
+    max_output_tokens=10000,
+    thinking_config=dict(
+        thinking_budget=0,
+    ),
 )
 
-MODEL_NAME = "gemini-2.5-flash-preview-05-20"
+# Rough size of the fixed refactoring instructions and schema, excluding the code itself
+REFACTORING_INSTRUCTION_TOKENS = 900
+REFACTORING_MIN_OUTPUT_TOKENS = 500
 
-def send_prompt(messages):
+genai_client = None
+
+
+def get_genai_client():
+    global genai_client
+    if genai_client is None:
+        genai_client = genai.Client(
+            vertexai=True,
+            project="abiding-circle-461421-a8",
+            location="global"
+        )
+    return genai_client
+
+def gemini_generate(messages):
     contents = []
     for msg in messages:
         parts = [types.Part(text=msg["content"])]
         contents.append(types.Content(role=msg["role"], parts=parts))
 
     config = types.GenerateContentConfig(
-        temperature=1,
-        top_p=1,
-        seed=0,
-        max_output_tokens=10000,
+        **GENERATION_CONFIG,
         safety_settings=[],
-        thinking_config=types.ThinkingConfig(
-            thinking_budget=0,
-        ),
     )
 
+    response = get_genai_client().models.generate_content(
+        model=MODEL_NAME,
+        contents=contents,
+        config=config,
+    )
+    return response.text
+
+def send_prompt(messages):
     try:
-        response = genai_client.models.generate_content(
-            model=MODEL_NAME,
-            contents=contents,
-            config=config,
-        )
-        full_response = response.text
+        metrics.incr("model.calls")
+        with metrics.timer("model.latency_seconds"):
+            if localModelClient.SERVER_URL:
+                full_response = localModelClient.generate(messages)
+            else:
+                full_response = gemini_generate(messages)
 
+        metrics.observe("model.output_chars", len(full_response or ""))
         parsed = parse_json(full_response)
         if parsed:
             return parsed
         else:
+            metrics.incr("model.unparsed_responses")
             print("Failed to parse Gemini response")
             return None
 
     except Exception as e:
+        metrics.incr("model.errors")
         print("Gemini API Error:", str(e))
         return None
 
 
+def without_solid_violations(data):
+    """True for detection rows with no violated principle, which leave the model nothing to refactor"""
+    return not any(v.get("violatedPrinciples") for v in data.get("violations") or [])
+
+
+def without_coupling_smells(data):
+    """True for pre-filter rows and detection rows with no smell, which leave nothing to refactor"""
+    if data.get("labelled_by", "model") != "model":
+        return True
+    return not any(v.get("smells") for v in data.get("couplingSmells") or [])
+
+
+def solid_refactoring_messages(data):
+    return [
+        {
+            "role": "user",
+            "content": "\n".join([
+                "You are an expert Java developer specialized in applying Single Responsibility and Open-Closed principles through code refactoring.",
+                "You will be given one main Java file, with some dependencies (maybe none) along with a structured JSON detailing the detected Single Responsibility, Open-Closed violations in the main file.",
+                "Your task is to refactor the code to eliminate these violations while maintaining and improving overall code clarity and design.",
+                "",
+                "For reference, here are brief descriptions of the SRP and OCP principles:",
+                "- SRP (Single Responsibility): A class should have only one reason to change, i.e., one responsibility.",
+                "- OCP (Open/Closed): Classes should be open for extension, but closed for modification.",
+                "Apply a step-by-step reasoning process to identify the best approach for refactoring each violation.",
+                "After making initial changes, re-evaluate the result and improve it further if needed.",
+                "Then, reflect on the outcome: did you miss anything? Did your refactoring introduce new issues? If so, revise accordingly.",
+                "You should return the main file in case of being updated with its updated content.",
+                "You should return the created files with its content.",
+                "Never add multiple classes/enums/interfaces in the same file; if needed, create a new file for each.",
+                "After refactoring the main file and adding any new files, you must:",
+                "- Review all dependency files for references to the main file’s class, methods, or fields.",
+                "- Update those dependency files to reflect any renames, deletions, or new methods introduced in your refactor.",
+                "- Ensure there are no invalid references in dependency files (such as calling a method that no longer exists).",
+                "All updated dependency files should be included in your output alongside the main file and new files, following the Pydantic schema format.",
+                "Don't return a file unless it is updated or created.",
+                "",
+                "## Critical Output and Formatting Rules:",
+                "1. **Comment Formatting for Unfixable Dependencies:** This is a strict requirement. If a dependency cannot be updated due to missing context, you must leave a comment. IT IS CRITICAL that you add a line break (`\\n`) immediately after the comment. The code that follows the comment MUST start on a new line to avoid compilation errors.",
+                "2. **No Extra Content:** Do not include any explanation, introduction, or conclusion outside the final JSON output.",
+                "3. **Code Formatting:** Return the code in one line without extra spaces or break lines. Don't add any comments.",
+                "4. **JSON Structure:** You must follow the format defined in the Pydantic schema for the refactoring output.",
+                "",
+                "Be precise, complete, and objective. If no changes are needed, reflect that in the response.",
+                "## Code:",
+                json.dumps(data["prompt"], ensure_ascii=False),
+                "",
+                "## SO Violations:",
+                json.dumps(data["violations"], ensure_ascii=False),
+                "",
+                "## Pydantic Details:",
+                json.dumps(RefactoringOutput.model_json_schema(), ensure_ascii=False),
+                "",
+                "## Refactored Code:",
+                "```json"
+            ])
+        }
+    ]
+
+
+def solid_refactoring_result(data, response):
+    """Builds the output record, or returns None when the response has no usable file list"""
+    try:
+        refactored_files = response.get("refactored_files", [])
+    except Exception as e:
+        return None
+
+    return {
+        "project_id": data["project_id"],
+        "chunk_id": data["chunk_id"],
+        "prompt": {
+            "code": data["prompt"],
+            "violations": data["violations"]
+        },
+        "task": "SO Violations Refactoring",
+        "output_schema": json.dumps(RefactoringOutput.model_json_schema(),
+                                    ensure_ascii=False),
+        "refactored_files": refactored_files
+    }
+
+
+def is_valid_result(result):
+    if result is None:
+        metrics.incr("validation.missing_result")
+        return False
+    if not is_valid_obj(result):
+        metrics.incr("validation.schema_failures")
+        return False
+    with metrics.timer("validation.parse_seconds"):
+        valid_code = is_valid_code(result)
+    if not valid_code:
+        metrics.incr("validation.code_failures")
+    return valid_code
+
+
+def write_if_valid(result, line, f_out, unparsed_f_out):
+    if is_valid_result(result):
+        print("ok")
+        f_out.write(json.dumps(result) + "\n")
+        return True
+    print("not ok")
+    unparsed_f_out.write(line)
+    return False
+
+
+def refactor_solid_line(data, line, f_out, unparsed_f_out):
+    response = send_prompt(solid_refactoring_messages(data))
+    print(response)
+
+    if not response:
+        unparsed_f_out.write(line)
+        return
+
+    write_if_valid(solid_refactoring_result(data, response), line, f_out, unparsed_f_out)
+
+
 def refactor_solid_violations(input_path, output_path, unparsed_path):
     with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
         for line in f_in:
             data = json.loads(line)
+            if not without_solid_violations(data):
+                refactor_solid_line(data, line, f_out, unparsed_f_out)
 
-            solid_violations_refactoring_messages = [
-                {
-                    "role": "user",
-                    "content": "\n".join([
-                        "You are an expert Java developer specialized in applying Single Responsibility and Open-Closed principles through code refactoring.",
-                        "You will be given one main Java file, with some dependencies (maybe none) along with a structured JSON detailing the detected Single Responsibility, Open-Closed violations in the main file.",
-                        "Your task is to refactor the code to eliminate these violations while maintaining and improving overall code clarity and design.",
-                        "",
-                        "For reference, here are brief descriptions of the SRP and OCP principles:",
-                        "- SRP (Single Responsibility): A class should have only one reason to change, i.e., one responsibility.",
-                        "- OCP (Open/Closed): Classes should be open for extension, but closed for modification.",
-                        "Apply a step-by-step reasoning process to identify the best approach for refactoring each violation.",
-                        "After making initial changes, re-evaluate the result and improve it further if needed.",
-                        "Then, reflect on the outcome: did you miss anything? Did your refactoring introduce new issues? If so, revise accordingly.",
-                        "You should return the main file in case of being updated with its updated content.",
-                        "You should return the created files with its content.",
-                        "Never add multiple classes/enums/interfaces in the same file; if needed, create a new file for each.",
-                        "After refactoring the main file and adding any new files, you must:",
-                        "- Review all dependency files for references to the main file’s class, methods, or fields.",
-                        "- Update those dependency files to reflect any renames, deletions, or new methods introduced in your refactor.",
-                        "- Ensure there are no invalid references in dependency files (such as calling a method that no longer exists).",
-                        "All updated dependency files should be included in your output alongside the main file and new files, following the Pydantic schema format.",
-                        "Don't return a file unless it is updated or created.",
-                        "",
-                        "## Critical Output and Formatting Rules:",
-                        "1. **Comment Formatting for Unfixable Dependencies:** This is a strict requirement. If a dependency cannot be updated due to missing context, you must leave a comment. IT IS CRITICAL that you add a line break (`\\n`) immediately after the comment. The code that follows the comment MUST start on a new line to avoid compilation errors.",
-                        "2. **No Extra Content:** Do not include any explanation, introduction, or conclusion outside the final JSON output.",
-                        "3. **Code Formatting:** Return the code in one line without extra spaces or break lines. Don't add any comments.",
-                        "4. **JSON Structure:** You must follow the format defined in the Pydantic schema for the refactoring output.",
-                        "",
-                        "Be precise, complete, and objective. If no changes are needed, reflect that in the response.",
-                        "## Code:",
-                        json.dumps(data["prompt"], ensure_ascii=False),
-                        "",
-                        "## SO Violations:",
-                        json.dumps(data["violations"], ensure_ascii=False),
-                        "",
-                        "## Pydantic Details:",
-                        json.dumps(RefactoringOutput.model_json_schema(), ensure_ascii=False),
-                        "",
-                        "## Refactored Code:",
-                        "```json"
-                    ])
-                }
-            ]
-
-            response = send_prompt(solid_violations_refactoring_messages)
-            print(response)
 
-            if not response:
-                unparsed_f_out.write(line)
-                continue
+def coupling_refactoring_messages(data):
+    return [
+        {
+            "role": "user",
+            "content": "\n".join([
+                "You are an expert Java developer focused on improving code maintainability by eliminating coupling code smells.",
+                "You will be given one or more Java files, along with a structured JSON identifying the detected coupling smells.",
+                "Your task is to refactor the code to reduce or eliminate excessive coupling while preserving intended behavior.",
+                "",
+                "For reference, here are the coupling smells you are expected to address:",
+                "- Feature Envy: A method accesses data from another class more than from its own.",
+                "- Inappropriate Intimacy: Classes that are too familiar and frequently access each other's internals.",
+                "- Incomplete Library Class: A library or third-party class lacks required features, leading users to implement workaround logic.",
+                "- Message Chains: A method navigates through multiple objects to retrieve a result (e.g., a.getB().getC().doSomething()).",
+                "- Middle Man: A class delegates most of its work to another class and adds little or no behavior of its own.",
+                "",
+                "Apply a step-by-step reasoning process to decide how best to restructure the design.",
+                "After making your initial refactor, recheck the output and refine it if necessary.",
+                "Reflect on your work: did you overlook any issue? Did your solution create a new one? If so, revise it.",
+                "",
+                "Do not include any explanation outside the JSON.",
+                "You must follow the format defined in the Pydantic schema for Coupling Refactoring output.",
+                "",
+                "Be precise, complete, and objective. If no changes are needed, reflect that in the response.",
+                "Do not generate any introduction or conclusion."
+                "## Code:",
+                json.dumps(data["prompt"], ensure_ascii=False),
+                "",
+                "## Coupling code smells:",
+                json.dumps(data["couplingSmells"], ensure_ascii=False),
+                "",
+                "## Pydantic Details:",
+                json.dumps(RefactoringOutput.model_json_schema(), ensure_ascii=False),
+                "",
+                "## Refactored Code:",
+                "```json"
+            ])
+        }
+    ]
 
-            try:
-                refactored_files = response.get("refactored_files", [])
-            except Exception as e:
-                unparsed_f_out.write(line)
-                continue
 
-            result = {
-                "project_id": data["project_id"],
-                "chunk_id": data["chunk_id"],
-                "prompt": {
-                    "code": data["prompt"],
-                    "violations": data["violations"]
-                },
-                "task": "SO Violations Refactoring",
-                "output_schema": json.dumps(RefactoringOutput.model_json_schema(),
-                                            ensure_ascii=False),
-                "refactored_files": refactored_files
-            }
-            if is_valid_obj(result) and is_valid_code(result):
-                print("ok")
-                f_out.write(json.dumps(result) + "\n")
-            else:
-                print("not ok")
-                unparsed_f_out.write(line)
+def coupling_refactoring_result(data, response):
+    try:
+        refactored_files = response.get("refactored_files", [])
+    except Exception as e:
+        return None
+
+    return {
+        "project_id": data["project_id"],
+        "chunk_id": data["chunk_id"],
+        "prompt": {
+            "code": data["prompt"],
+            "couplingSmells": data["couplingSmells"]
+        },
+        "task": "Coupling Smells Refactoring",
+        "output_schema": json.dumps(RefactoringOutput.model_json_schema(),
+                                    ensure_ascii=False),
+        "refactored_files": refactored_files
+    }
+
+
+def refactor_coupling_line(data, line, f_out, unparsed_f_out):
+    response = send_prompt(coupling_refactoring_messages(data))
+    if not response:
+        unparsed_f_out.write(line)
+        return
+
+    write_if_valid(coupling_refactoring_result(data, response), line, f_out, unparsed_f_out)
+    print(response)
 
 
 def refactor_coupling_smells(input_path, output_path, unparsed_path):
     with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
         for line in f_in:
             data = json.loads(line)
+            if not without_coupling_smells(data):
+                refactor_coupling_line(data, line, f_out, unparsed_f_out)
 
-            coupling_smells_refactoring_messages = [
-                {
-                    "role": "user",
-                    "content": "\n".join([
-                        "You are an expert Java developer focused on improving code maintainability by eliminating coupling code smells.",
-                        "You will be given one or more Java files, along with a structured JSON identifying the detected coupling smells.",
-                        "Your task is to refactor the code to reduce or eliminate excessive coupling while preserving intended behavior.",
-                        "",
-                        "For reference, here are the coupling smells you are expected to address:",
-                        "- Feature Envy: A method accesses data from another class more than from its own.",
-                        "- Inappropriate Intimacy: Classes that are too familiar and frequently access each other's internals.",
-                        "- Incomplete Library Class: A library or third-party class lacks required features, leading users to implement workaround logic.",
-                        "- Message Chains: A method navigates through multiple objects to retrieve a result (e.g., a.getB().getC().doSomething()).",
-                        "- Middle Man: A class delegates most of its work to another class and adds little or no behavior of its own.",
-                        "",
-                        "Apply a step-by-step reasoning process to decide how best to restructure the design.",
-                        "After making your initial refactor, recheck the output and refine it if necessary.",
-                        "Reflect on your work: did you overlook any issue? Did your solution create a new one? If so, revise it.",
-                        "",
-                        "Do not include any explanation outside the JSON.",
-                        "You must follow the format defined in the Pydantic schema for Coupling Refactoring output.",
-                        "",
-                        "Be precise, complete, and objective. If no changes are needed, reflect that in the response.",
-                        "Do not generate any introduction or conclusion."
-                        "## Code:",
-                        json.dumps(data["prompt"], ensure_ascii=False),
-                        "",
-                        "## Coupling code smells:",
-                        json.dumps(data["couplingSmells"], ensure_ascii=False),
-                        "",
-                        "## Pydantic Details:",
-                        json.dumps(RefactoringOutput.model_json_schema(), ensure_ascii=False),
-                        "",
-                        "## Refactored Code:",
-                        "```json"
-                    ])
-                }
-            ]
-            response = send_prompt(coupling_smells_refactoring_messages)
-            if not response:
-                unparsed_f_out.write(line)
-                continue
 
-            try:
-                refactored_files = response.get("refactored_files", [])
-            except Exception as e:
-                unparsed_f_out.write(line)
-                continue
+"""## Scheduled Mode"""
+
+def refactoring_output_tokens(data, prompt_tokens):
+    # The model re-emits every file it touches, so the answer grows with the code in the prompt
+    code_tokens = prompt_tokens - REFACTORING_INSTRUCTION_TOKENS
+    return max(REFACTORING_MIN_OUTPUT_TOKENS, min(GENERATION_CONFIG["max_output_tokens"], code_tokens))
+
+
+def run_refactoring_scheduled(input_path, output_path, unparsed_path, build_messages, refactor_line,
+                              rerun_path=None, skip=None, workers=8, tokens_per_minute=TOKENS_PER_MINUTE):
+    """
+    Reruns first and longest chunks first across `workers` concurrent requests that share a
+    per-minute token budget. Chunks already in the output, and rows `skip` rejects, are not sent.
+    A chunk whose handler raises goes to the rerun file; an unreachable JavaParser service stops
+    the run.
+    """
+    work = build_work(input_path, build_messages, refactoring_output_tokens, rerun_path, labelled_ids(output_path),
+                      skip)
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        f_out, unparsed_f_out = SynchronizedWriter(f_out), SynchronizedWriter(unparsed_f_out)
+        run_schedule(work, lambda item: refactor_line(item.data, item.line, f_out, unparsed_f_out),
+                     workers, tokens_per_minute, lambda item, e: unparsed_f_out.write(item.line),
+                     fatal=(ParserUnavailable,))
+
+
+def refactor_solid_violations_scheduled(input_path, output_path, unparsed_path, rerun_path=None, **kwargs):
+    run_refactoring_scheduled(input_path, output_path, unparsed_path, solid_refactoring_messages,
+                              refactor_solid_line, rerun_path, without_solid_violations, **kwargs)
+
+
+def refactor_coupling_smells_scheduled(input_path, output_path, unparsed_path, rerun_path=None, **kwargs):
+    run_refactoring_scheduled(input_path, output_path, unparsed_path, coupling_refactoring_messages,
+                              refactor_coupling_line, rerun_path, without_coupling_smells, **kwargs)
+
+
+"""## Pipelined Mode"""
+
+def refactor_pipelined(input_path, output_path, unparsed_path, build_messages, build_result, skip=None,
+                       call_workers=8, validate_workers=2, queue_size=32):
+    """
+    Runs prompt building, model calls, validation and writing as separate stages with bounded
+    queues between them, so model calls keep going while earlier responses are validated.
+    Items a stage fails on go to the rerun file like unparsable responses do; chunks already in
+    the output and rows `skip` rejects are not sent. An unreachable JavaParser service stops the run instead of sending
+    every remaining item to the rerun file. Returns per-stage throughput counters.
+    """
+    done = labelled_ids(output_path)
+    with open(input_path, "r") as f_in, open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        unparsed_f_out = SynchronizedWriter(unparsed_f_out)
+
+        def build(line):
+            data = json.loads(line)
+            if record_id(data) in done:
+                return None
+            if skip is not None and skip(data):
+                metrics.incr("labelling.nothing_to_do")
+                return None
+            return {"data": data, "line": line, "messages": build_messages(data)}
+
+        def call(item):
+            item["response"] = send_prompt(item.pop("messages"))
+            return item
 
-            result = {
-                "project_id": data["project_id"],
-                "chunk_id": data["chunk_id"],
-                "prompt": {
-                    "code": data["prompt"],
-                    "couplingSmells": data["couplingSmells"]
-                },
-                "task": "Coupling Smells Refactoring",
-                "output_schema": json.dumps(RefactoringOutput.model_json_schema(),
-                                            ensure_ascii=False),
-                "refactored_files": refactored_files
-            }
-
-            if is_valid_obj(result) and is_valid_code(result):
-                f_out.write(json.dumps(result) + "\n")
+        def validate(item):
+            response = item["response"]
+            item["result"] = build_result(item["data"], response) if response else None
+            item["valid"] = is_valid_result(item["result"])
+            return item
+
+        def write(item):
+            if item["valid"]:
                 print("ok")
-                print(response)
+                f_out.write(json.dumps(item["result"]) + "\n")
             else:
-                unparsed_f_out.write(line)
                 print("not ok")
-                print(response)
+                unparsed_f_out.write(item["line"])
+
+        def rerun_failed(stage_name, item, error):
+            # The build stage receives the raw input line; later stages carry it in the item
+            unparsed_f_out.write(item if isinstance(item, str) else item["line"])
+
+        return run_pipeline(f_in, [
+            Stage("build", build, 1, queue_size),
+            Stage("model", call, call_workers, queue_size),
+            Stage("validate", validate, validate_workers, queue_size),
+            Stage("write", write, 1, queue_size),
+        ], on_error=rerun_failed, fatal=(ParserUnavailable,))
+
+
+def refactor_solid_violations_pipelined(input_path, output_path, unparsed_path, **kwargs):
+    return refactor_pipelined(input_path, output_path, unparsed_path, solid_refactoring_messages,
+                              solid_refactoring_result, without_solid_violations, **kwargs)
+
+
+def refactor_coupling_smells_pipelined(input_path, output_path, unparsed_path, **kwargs):
+    return refactor_pipelined(input_path, output_path, unparsed_path, coupling_refactoring_messages,
+                              coupling_refactoring_result, without_coupling_smells, **kwargs)
+
+
+"""## Batch Mode"""
+
+def write_solid_refactoring_batch(input_path, batch_path):
+    return write_batch_requests(input_path, batch_path, solid_refactoring_messages, GENERATION_CONFIG)
+
+
+def write_coupling_refactoring_batch(input_path, batch_path):
+    return write_batch_requests(input_path, batch_path, coupling_refactoring_messages, GENERATION_CONFIG)
+
+
+def ingest_refactoring_batch(input_path, results_path, output_path, unparsed_path, build_result):
+    """
+    Runs the real-time post-processing over a provider results file: unparsable, malformed or
+    chopped outputs go to the rerun file, the rest to the output file.
+    """
+    with open(output_path, "a") as f_out, open(unparsed_path, "a") as unparsed_f_out:
+        for data, line, text in iter_batch_results(input_path, results_path):
+            response = parse_json(text) if text else None
+            if not response:
+                unparsed_f_out.write(line)
+                continue
+            write_if_valid(build_result(data, response), line, f_out, unparsed_f_out)
+
+
+def ingest_solid_refactoring_batch(input_path, results_path, output_path, unparsed_path):
+    ingest_refactoring_batch(input_path, results_path, output_path, unparsed_path, solid_refactoring_result)
+
+
+def ingest_coupling_refactoring_batch(input_path, results_path, output_path, unparsed_path):
+    ingest_refactoring_batch(input_path, results_path, output_path, unparsed_path, coupling_refactoring_result)
 
 
+if __name__ == "__main__":
+    # refactor_solid_violations("Mariam.jsonl", "o.jsonl", "rerun.jsonl")
+    refactor_coupling_smells("Mariam.jsonl", "MariamOut.jsonl", "rerun.jsonl")
 
-# refactor_solid_violations("Mariam.jsonl", "o.jsonl", "rerun.jsonl")
-refactor_coupling_smells("Mariam.jsonl", "MariamOut.jsonl", "rerun.jsonl")
+    # Batch mode: write the request file, submit it to the provider, then ingest its results file
+    # write_coupling_refactoring_batch("Mariam.jsonl", "couplingRefactoringBatchRequests.jsonl")
+    # ingest_coupling_refactoring_batch("Mariam.jsonl", "couplingRefactoringBatchResults.jsonl", "MariamOut.jsonl", "rerun.jsonl")
@@ -0,0 +1,207 @@
+#! /usr/bin/env python3
+"""
+Length-aware scheduling of labelling requests.
+
+Work items are ordered rerun-first, then longest-first by estimated prompt + output tokens
+(LPT scheduling), and handed to a pool of workers that share a per-minute token budget.
+"""
+import os, sys, json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+from tokenEstimator import load_estimator
+import pipelineMetrics as metrics
+from labellingBatch import record_id
+
+ESTIMATOR = load_estimator()
+TOKENS_PER_MINUTE = 1_000_000
+WINDOW_SECONDS = 60.0
+RERUN_PRIORITY = 0
+DEFAULT_PRIORITY = 1
+
+
+class WorkItem:
+    __slots__ = ("data", "line", "priority", "prompt_tokens", "output_tokens")
+
+    def __init__(self, data, line, priority, prompt_tokens, output_tokens):
+        self.data = data
+        self.line = line
+        self.priority = priority
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.output_tokens
+
+
+def estimate_prompt_tokens(messages):
+    return sum(ESTIMATOR.estimate(msg["content"]) for msg in messages)
+
+
+def order_work(items):
+    """Reruns first, then longest-first; ties keep file order so runs are reproducible"""
+    return sorted(items, key=lambda item: (item.priority, -item.tokens))
+
+
+def labelled_ids(output_path, keep=None):
+    """record_id of every row already in a labelled output for which `keep(rec)` holds"""
+    ids = set()
+    if not output_path or not os.path.exists(output_path):
+        return ids
+    with open(output_path, "r") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if keep is None or keep(rec):
+                ids.add(record_id(rec))
+    return ids
+
+
+def build_work(input_path, build_messages, expected_output_tokens, rerun_path=None, done=None, skip=None):
+    """
+    Reads the input (and rerun) JSONL into scheduled work items. `expected_output_tokens(data,
+    prompt_tokens)` is the per-task guess at the response length. A record that is both in the
+    rerun file and the input (or repeated in the rerun file) is labelled once, as a rerun.
+    Records whose id is in `done` (see `labelled_ids`) are already labelled and left out, so an
+    interrupted or repeated run only pays for what is missing. Records for which `skip(data)` is
+    true have nothing to send and are left out too.
+    """
+    sources = [(input_path, DEFAULT_PRIORITY)]
+    if rerun_path and os.path.exists(rerun_path):
+        sources.insert(0, (rerun_path, RERUN_PRIORITY))
+
+    items, seen, skipped, already, nothing_to_do = [], set(), 0, 0, 0
+    done = done or set()
+    for path, priority in sources:
+        with open(path, "r") as f:
+            for line in f:
+                data = json.loads(line)
+                key = record_id(data)
+                if key in done:
+                    already += 1
+                    continue
+                if skip is not None and skip(data):
+                    nothing_to_do += 1
+                    continue
+                if key in seen:
+                    skipped += 1
+                    continue
+                seen.add(key)
+                if priority == RERUN_PRIORITY:
+                    metrics.incr("labelling.retries")
+                prompt_tokens = estimate_prompt_tokens(build_messages(data))
+                items.append(WorkItem(data, line, priority, prompt_tokens,
+                                      expected_output_tokens(data, prompt_tokens)))
+    if already:
+        metrics.incr("labelling.already_labelled", already)
+        print(f"Skipped {already} records already in the output.")
+    if nothing_to_do:
+        metrics.incr("labelling.nothing_to_do", nothing_to_do)
+        print(f"Skipped {nothing_to_do} records with nothing to send.")
+    if skipped:
+        metrics.incr("labelling.duplicates_skipped", skipped)
+        print(f"Skipped {skipped} records already scheduled from the rerun file or earlier in the input.")
+    return order_work(items)
+
+
+class TokenBudget:
+    """Sliding one-minute window over the tokens of requests already started."""
+
+    def __init__(self, tokens_per_minute=TOKENS_PER_MINUTE, window=WINDOW_SECONDS, clock=time.monotonic):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.clock = clock
+        self._spent = deque()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._spent and self._spent[0][0] <= now - self.window:
+            self._used -= self._spent.popleft()[1]
+
+    def earliest_start(self, tokens, now):
+        """First time at or after `now` when `tokens` fit in the window"""
+        self._expire(now)
+        # A single request larger than the whole budget still has to run eventually
+        tokens = min(tokens, self.tokens_per_minute)
+        used = self._used
+        for started, spent in self._spent:
+            if used + tokens <= self.tokens_per_minute:
+                break
+            used -= spent
+            now = started + self.window
+        return now
+
+    def record(self, tokens, at):
+        self._spent.append((at, tokens))
+        self._used += tokens
+
+    def acquire(self, tokens):
+        while True:
+            with self._lock:
+                now = self.clock()
+                start = self.earliest_start(tokens, now)
+                if start <= now:
+                    self.record(tokens, now)
+                    return
+            time.sleep(start - now)
+
+
+class SynchronizedWriter:
+    """Serialises writes from worker threads onto one output file"""
+
+    def __init__(self, f):
+        self._f = f
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._f.write(text)
+
+
+def run_schedule(work, handler, workers=8, tokens_per_minute=TOKENS_PER_MINUTE, on_error=None, fatal=()):
+    """
+    Runs `handler(item)` for every work item, in schedule order, on `workers` threads that
+    respect the shared token budget. Returns the handlers' results in schedule order.
+
+    An item whose handler raises is handed to `on_error(item, exc)` (e.g. to write it to the rerun
+    file) and its worker moves on. An exception of a type in `fatal` stops every worker before its
+    next item instead, and is raised once they have all finished.
+    """
+    budget = TokenBudget(tokens_per_minute)
+    queue = deque(work)
+    queue_lock = threading.Lock()
+    results = [None] * len(work)
+    index = {id(item): i for i, item in enumerate(work)}
+    failures = []
+
+    def worker():
+        while True:
+            with queue_lock:
+                if not queue or failures:
+                    return
+                item = queue.popleft()
+            budget.acquire(item.tokens)
+            try:
+                results[index[id(item)]] = handler(item)
+            except fatal as e:
+                print(f"Stopping the schedule: {type(e).__name__}: {e}")
+                failures.append(e)
+            except Exception as e:
+                print(f"{type(e).__name__}: {e}")
+                metrics.incr("labelling.handler_errors")
+                if on_error is not None:
+                    on_error(item, e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(worker) for _ in range(workers)]:
+            future.result()
+    if failures:
+        raise failures[0]
+    return results
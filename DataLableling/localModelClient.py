@@ -0,0 +1,24 @@
+"""
+Client for TestingFinetunedModels/inferenceServer.py.
+
+When CODEAID_SERVER_URL is set, the labelling modules' `send_prompt` sends its messages to that
+server instead of Gemini and parses the reply the same way.
+"""
+import os
+import json
+import urllib.request
+
+SERVER_URL = os.environ.get("CODEAID_SERVER_URL")
+REQUEST_TIMEOUT = 3600
+
+
+def generate(messages, max_new_tokens=None, url=None, timeout=REQUEST_TIMEOUT):
+    """Returns the model's raw text for `messages`"""
+    body = {"messages": messages}
+    if max_new_tokens:
+        body["max_new_tokens"] = max_new_tokens
+    request = urllib.request.Request(f"{(url or SERVER_URL).rstrip('/')}/generate",
+                                     data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())["text"]
@@ -0,0 +1,42 @@
+import os, sys, json
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from labellingBatch import write_batch_requests, iter_batch_results
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+INPUT = os.path.join(FIXTURES, "batchInput.jsonl")
+RESULTS = os.path.join(FIXTURES, "batchResults.jsonl")
+GENERATION_CONFIG = {"max_output_tokens": 100, "thinking_config": {"thinking_budget": 0}}
+
+
+def messages(data):
+    return [{"role": "user", "content": data["content"]["main_file_content"]}]
+
+
+def test_write_batch_requests(tmp_path):
+    batch_path = tmp_path / "batch.jsonl"
+    assert write_batch_requests(INPUT, batch_path, messages, GENERATION_CONFIG) == 4
+
+    requests = [json.loads(line) for line in batch_path.read_text().splitlines()]
+    assert [r["key"] for r in requests] == ["1:src/B.java:0", "2:src/C.java:0", "2:src/C.java:1", "1:src/A.java:0"]
+    # The rerun row appended for A replaces the original one
+    assert requests[3]["request"]["contents"][0]["parts"][0]["text"] == "class A { int x; }"
+    assert requests[0]["request"]["generationConfig"] == {"maxOutputTokens": 100, "thinkingConfig": {"thinkingBudget": 0}}
+
+
+def test_write_batch_requests_skip(tmp_path):
+    batch_path = tmp_path / "batch.jsonl"
+    skip = lambda data: not data["content"]["dependencies"]
+    assert write_batch_requests(INPUT, batch_path, messages, GENERATION_CONFIG, skip) == 1
+
+
+def test_iter_batch_results_round_trip():
+    joined = {(data["project_id"], data["content"]["main_file_path"], data["chunk_id"]): (data, text)
+              for data, line, text in iter_batch_results(INPUT, RESULTS)}
+    assert len(joined) == 4
+    data, text = joined[(1, "src/A.java", 0)]
+    assert data["content"]["main_file_content"] == "class A { int x; }"
+    assert json.loads(text) == {"violations": ["A"]}
+    assert json.loads(joined[(1, "src/B.java", 0)][1]) == {"violations": ["B"]}
+    assert json.loads(joined[(2, "src/C.java", 1)][1]) == {"violations": []}
+    assert joined[(2, "src/C.java", 0)][1] is None
@@ -39,8 +39,9 @@ def compare_and_save(old_path, new_path, output_path):
 
     print(f"✅ Done. {len(output)} objects written to {output_path}.")
 
-# compare_and_save("old/small.jsonl", "new/small.jsonl", "diffs/small.jsonl")
-compare_and_save("old/medium.jsonl", "new/medium.jsonl", "diffs/medium.jsonl")
-compare_and_save("old/large.jsonl", "new/large.jsonl", "diffs/large.jsonl")
+if __name__ == "__main__":
+    # compare_and_save("old/small.jsonl", "new/small.jsonl", "diffs/small.jsonl")
+    compare_and_save("old/medium.jsonl", "new/medium.jsonl", "diffs/medium.jsonl")
+    compare_and_save("old/large.jsonl", "new/large.jsonl", "diffs/large.jsonl")
 
 
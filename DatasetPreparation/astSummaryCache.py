@@ -0,0 +1,79 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pipelineMetrics as metrics
+from javaParserService import get_client
+
+CACHE_DIR = os.environ.get("AST_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".astCache"))
+# Bump the summary suffix whenever the daemon's summary fields change
+PARSER_VERSION = "javaparser-core-3.25.4:JAVA_17:summary-2"
+MEMORY_CACHE_SIZE = 4096
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def summary_key(code):
+    return hashlib.sha256(f"{PARSER_VERSION}\0{code}".encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _load(key):
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store(key, summary):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write-then-rename so concurrent workers never read a half-written entry
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(summary, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _remember(key, summary):
+    with _memory_lock:
+        _memory[key] = summary
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+def get_summary(code):
+    """
+    Parse summary of a Java source string: package, declared types, referenced names, member
+    signatures and whether it parsed. Served from memory or disk when the same content was
+    summarized before; only a miss reaches the JavaParser service. The most recently used
+    MEMORY_CACHE_SIZE summaries are also kept in memory.
+    """
+    key = summary_key(code)
+    with _memory_lock:
+        summary = _memory.get(key)
+    if summary is None:
+        summary = _load(key)
+    if summary is None:
+        stats["misses"] += 1
+        metrics.incr("ast_cache.misses")
+        with metrics.timer("parse.file_seconds"):
+            summary = get_client().summarize(code)
+        if not summary.get("parsed"):
+            metrics.incr("parse.failures")
+        _store(key, summary)
+    else:
+        stats["hits"] += 1
+        metrics.incr("ast_cache.hits")
+    _remember(key, summary)
+    return summary
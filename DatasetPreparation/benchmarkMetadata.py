@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from generateMetadata import process_projects
+
+
+def write_synthetic_corpus(root, projects, files_per_project, methods_per_file, seed=0):
+    rng = random.Random(seed)
+    total_bytes = 0
+    for p in range(projects):
+        for f in range(files_per_project):
+            pkg = f"com.bench.p{p}.m{f % 5}"
+            file_dir = Path(root) / f"project{p}" / "src" / "main" / "java" / Path(*pkg.split("."))
+            os.makedirs(file_dir, exist_ok=True)
+            lines = [f"package {pkg};", "", "import java.util.List;", "", "/**", " * Synthetic class.", " */",
+                     f"public class C{f} {{"]
+            for m in range(methods_per_file):
+                lines += [
+                    f"    // method {m}",
+                    f"    public int m{m}(int x) {{",
+                    f"        int y = x * {rng.randint(1, 1000)} + {rng.randint(1, 1000)};",
+                    "        return y;",
+                    "    }",
+                ]
+            lines.append("}")
+            code = "\n".join(lines)
+            (file_dir / f"C{f}.java").write_text(code, encoding="utf-8")
+            total_bytes += len(code)
+    return total_bytes
+
+
+def run(workers, raw_dir, out_dir):
+    cleaned_dir = os.path.join(out_dir, f"cleaned-{workers}")
+    metadata_file = os.path.join(out_dir, f"metadata-{workers}.json")
+    start = time.perf_counter()
+    metadata = process_projects(raw_dir, cleaned_dir, metadata_file, workers)
+    return time.perf_counter() - start, metadata
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput benchmark for generateMetadata on a synthetic corpus.")
+    parser.add_argument("--projects", type=int, default=16)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--methods", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="metadata-bench-")
+    try:
+        raw_dir = os.path.join(tmp, "raw")
+        total_bytes = write_synthetic_corpus(raw_dir, args.projects, args.files, args.methods)
+        print(f"Corpus: {args.projects} projects, {args.projects * args.files} files, {total_bytes / 1e6:.1f} MB")
+
+        baseline = None
+        for workers in args.workers:
+            elapsed, metadata = run(workers, raw_dir, tmp)
+            if baseline is None:
+                baseline = metadata
+            elif json.dumps(metadata) != json.dumps(baseline):
+                sys.exit(f"Metadata mismatch with {workers} workers")
+            tokens = sum(m["total_tokens"] for m in metadata)
+            print(f"workers={workers:<3} {elapsed:7.2f}s  {total_bytes / elapsed / 1e6:7.2f} MB/s  "
+                  f"{tokens / elapsed:10.0f} tokens/s")
+    finally:
+        shutil.rmtree(tmp)
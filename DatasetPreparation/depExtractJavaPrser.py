@@ -1,122 +1,30 @@
 #!/usr/bin/env python3
 import os, sys, json
-import jpype, jpype.imports
-from jpype.types import JString
+from javaFileIndex import load_index
+from astSummaryCache import get_summary
 
-# 1️⃣ Start the JVM with JavaParser on the classpath
-JAR = "libs/javaparser-core-3.25.4.jar"
-if not jpype.isJVMStarted():
-    jpype.startJVM(classpath=[JAR])
-
-# 2️⃣ Import the JavaParser types we need
-from com.github.javaparser import StaticJavaParser
-from com.github.javaparser.ast.body import ClassOrInterfaceDeclaration, AnnotationDeclaration
-from com.github.javaparser.ast.expr import (
-    ObjectCreationExpr, InstanceOfExpr, CastExpr, ClassExpr,
-    MethodReferenceExpr, VariableDeclarationExpr
-)
-from com.github.javaparser.ast.type import ReferenceType
-
-# 3️⃣ Utility: find all .java files
+# 1️⃣ Utility: find all .java files (module source roots, build/VCS dirs pruned)
 def find_java_files(root):
-    module_roots = []
-    for dirpath, dirnames, filenames in os.walk(root):
-        if 'pom.xml' in filenames or 'build.gradle' in filenames:
-            module_roots.append(dirpath)
-
-    java_paths = set()
-
-    if module_roots:
-        for module in module_roots:
-            scanned = False
-            for sub in ('src/main/java', 'src/test/java'):
-                base = os.path.join(module, sub)
-                if os.path.isdir(base):
-                    scanned = True
-                    for dp, _, files in os.walk(base):
-                        for f in files:
-                            if f.endswith('.java'):
-                                java_paths.add(os.path.join(dp, f))
-            if not scanned:
-                for dp, _, files in os.walk(module):
-                    for f in files:
-                        if f.endswith('.java'):
-                            java_paths.add(os.path.join(dp, f))
-    else:
-        for dp, _, files in os.walk(root):
-            for f in files:
-                if f.endswith('.java'):
-                    java_paths.add(os.path.join(dp, f))
-
-    for path in sorted(java_paths):
-        yield path
+    yield from load_index(root).module_source_paths()
 
-# 4️⃣ Build FQN → file map
+# 2️⃣ Build FQN → file map (parse summaries come from the AST summary cache)
 def build_fqn_map(root):
     fqn_map = {}
     for p in find_java_files(root):
-        cu = StaticJavaParser.parse(JString(open(p, 'r').read()))
-        pkg = cu.getPackageDeclaration().map(lambda d: d.getNameAsString()).orElse("")
-        for t in cu.getTypes():
-            raw = t.getNameAsString()
-            name = str(raw)
+        summary = get_summary(open(p, 'r').read())
+        if not summary["parsed"]:
+            raise ValueError(f"Failed to parse {p}: {summary['error']}")
+        pkg = summary["package"]
+        for name in summary["types"]:
             key = f"{pkg}.{name}" if pkg else name
             fqn_map[key] = p
     return fqn_map
 
-# 5️⃣ Extract imports and usage sets
-def extract_type_names(cu):
-    fq_imports = set()
-    wildcard_pkgs = set()
-    simple_names = set()
-
-    for imp in cu.getImports():
-        raw = imp.getNameAsString()
-        name = str(raw)
-        if imp.isAsterisk():
-            wildcard_pkgs.add(name)
-        else:
-            fq_imports.add(name)
-
-    for cid in cu.findAll(ClassOrInterfaceDeclaration):
-        for t in cid.getExtendedTypes():
-            simple_names.add(t.getNameAsString())
-        for t in cid.getImplementedTypes():
-            simple_names.add(t.getNameAsString())
-
-    for ann in cu.findAll(AnnotationDeclaration):
-        simple_names.add(ann.getNameAsString())
-
-    for vd in cu.findAll(VariableDeclarationExpr):
-        simple_names.add(vd.getElementType().asString())
-
-    for oc in cu.findAll(ObjectCreationExpr):
-        simple_names.add(oc.getType().getNameAsString())
-
-    for io in cu.findAll(InstanceOfExpr):
-        simple_names.add(io.getType().asString())
-
-    for c in cu.findAll(CastExpr):
-        simple_names.add(c.getType().asString())
-
-    for cl in cu.findAll(ClassExpr):
-        simple_names.add(cl.getType().asString())
-
-    for mr in cu.findAll(MethodReferenceExpr):
-        scope = mr.getScope()
-        if scope.isTypeExpr():
-            simple_names.add(scope.asTypeExpr().getType().asString())
-
-    for rt in cu.findAll(ReferenceType):
-        simple_names.add(rt.getElementType().asString())
-
-    fq_imports = {str(x) for x in fq_imports}
-    wildcard_pkgs = {str(x) for x in wildcard_pkgs}
-    simple_names = {str(x) for x in simple_names}
-
-    return fq_imports, wildcard_pkgs, simple_names
+# 3️⃣ Extract imports and usage sets
+def extract_type_names(summary):
+    return set(summary["fq_imports"]), set(summary["wildcard_pkgs"]), set(summary["simple_names"])
 
-# 6️⃣ Build dependency graph
+# 4️⃣ Build dependency graph
 def build_dependencies(root):
     fqn_map = build_fqn_map(root)
     deps = {}
@@ -126,11 +34,13 @@ def build_dependencies(root):
             deps_set.add(candidate_path)
 
     for src in find_java_files(root):
-        cu = StaticJavaParser.parse(JString(open(src, 'r').read()))
-        fq_imports, wildcard_pkgs, simple_names = extract_type_names(cu)
+        summary = get_summary(open(src, 'r').read())
+        if not summary["parsed"]:
+            raise ValueError(f"Failed to parse {src}: {summary['error']}")
+        fq_imports, wildcard_pkgs, simple_names = extract_type_names(summary)
         file_deps = set()
         covered_simple = set()
-        current_pkg = cu.getPackageDeclaration().map(lambda p: p.getNameAsString()).orElse("")
+        current_pkg = summary["package"]
 
         # 1. Process FQ imports
         for fqn in fq_imports:
@@ -175,7 +85,7 @@ def build_dependencies(root):
 
     return deps
 
-# 7️⃣ Main
+# 5️⃣ Main
 if __name__ == "__main__":
     # root = "../Dataset/Admission-counselling-system"
     root = "test\Instapay"
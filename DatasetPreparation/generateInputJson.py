@@ -4,45 +4,28 @@ import re
 from pathlib import Path
 import javalang
 import os
-import jpype
-from jpype.types import JString
-from jpype.imports import registerDomain
+from tokenEstimator import load_estimator, TokenCount, exceeds_budget
+from javaFileIndex import load_index
+from astSummaryCache import get_summary
+import pipelineMetrics as metrics
 
 # ========== CONFIG ==========
 CLEANED_DIR = "/Users/salmaameer/GradProject/dataSets/DataSet"
 METADATA_FILE = "/Users/salmaameer/GradProject/dataSets/datasetMetadata.json"
 DEPENDENCY_CACHE_FILE = "dependencies.json"
-JAR = "lib/javaparser-core-3.25.4.jar"
 TOKENIZER = tiktoken.get_encoding("cl100k_base")
+ESTIMATOR = load_estimator()
+CHUNK_TOKEN_BUDGET = 5000
 # ============================
 
-# Start JVM once
-if not jpype.isJVMStarted():
-    jpype.startJVM(classpath=[JAR])
-
-
-# Java imports
-from com.github.javaparser import StaticJavaParser
-from com.github.javaparser.ast.body import ClassOrInterfaceDeclaration, AnnotationDeclaration
-from com.github.javaparser.ast.expr import (
-    ObjectCreationExpr, InstanceOfExpr, CastExpr, ClassExpr,
-    MethodReferenceExpr, VariableDeclarationExpr,MethodCallExpr, NameExpr
-)
-from com.github.javaparser.ast.type import ReferenceType
-from com.github.javaparser import ParserConfiguration
-
-# Create parser configuration and set language level
-config = ParserConfiguration()
-config.setLanguageLevel(ParserConfiguration.LanguageLevel.JAVA_17)
-
-# Pass config to JavaParser
-StaticJavaParser.setConfiguration(config)
-
-
 def count_tokens(text):
     return len(TOKENIZER.encode(text))
 
 
+def count_tokens_batch(texts):
+    return [len(tokens) for tokens in TOKENIZER.encode_batch(texts)]
+
+
 def read_file(file_path):
     with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
@@ -64,10 +47,17 @@ def escape_newlines(text):
     return text.replace('\n', '\\n').replace('\r', '\\r')
 
 
+def observe_chunk_tokens(counts):
+    # Midpoint of the estimate unless the budget check already resolved the counts exactly
+    metrics.observe("chunk.tokens", sum(c.lo + c.hi for c in counts) / 2)
+
+
 def generate_chunks(project_id, main_file_path, main_file_content, dependencies):
-    main_file_tokens = count_tokens(main_file_content)
+    # Token counts stay as byte-based estimates unless a budget check is too close to call (or no
+    # calibration is fitted, in which case ESTIMATOR counts exactly)
+    main_file_tokens = TokenCount(main_file_content, ESTIMATOR)
     prompt_chunks = []
-    current_chunk_tokens = main_file_tokens
+    current_chunk_tokens = [main_file_tokens]
 
     chunk = {
         "project_id": project_id,
@@ -81,11 +71,12 @@ def generate_chunks(project_id, main_file_path, main_file_content, dependencies)
 
     for dep in dependencies:
         dep["file_content"] = escape_newlines(clean_java_code(dep.get("file_content")))
-        dep_tokens = count_tokens(dep["file_content"])
-        if current_chunk_tokens + dep_tokens > 5000:
+        dep_tokens = TokenCount(dep["file_content"], ESTIMATOR)
+        if exceeds_budget(current_chunk_tokens + [dep_tokens], CHUNK_TOKEN_BUDGET, count_tokens_batch):
             prompt_chunks.append(chunk)
+            observe_chunk_tokens(current_chunk_tokens)
             chunk_id = len(prompt_chunks)
-            current_chunk_tokens = main_file_tokens
+            current_chunk_tokens = [main_file_tokens]
             chunk = {
                 "project_id": project_id,
                 "chunk_id": chunk_id,
@@ -95,71 +86,40 @@ def generate_chunks(project_id, main_file_path, main_file_content, dependencies)
                     "dependencies": [dep]
                 }
             }
-            current_chunk_tokens += dep_tokens
+            current_chunk_tokens.append(dep_tokens)
         else:
             chunk["content"]["dependencies"].append(dep)
-            current_chunk_tokens += dep_tokens
+            current_chunk_tokens.append(dep_tokens)
 
     prompt_chunks.append(chunk)
+    observe_chunk_tokens(current_chunk_tokens)
     return prompt_chunks
 
 
 def find_java_files(root):
-    return [str(p) for p in Path(root).rglob("*.java")]
+    return load_index(root).paths()
 
 
 def build_fqn_map(root):
     fqn_map = {}
     for p in find_java_files(root):
-        try:
-            cu = StaticJavaParser.parse(JString(read_file(p)))
-            pkg = cu.getPackageDeclaration().map(lambda d: d.getNameAsString()).orElse("")
-            for t in cu.getTypes():
-                name = str(t.getNameAsString())
-                key = f"{pkg}.{name}" if pkg else name
-                fqn_map[key] = p
-        except Exception as e:
-            print(f"[FQN MAP] Failed to parse file: {p}\nError: {e}\n")
+        summary = get_summary(read_file(p))
+        if not summary["parsed"]:
+            print(f"[FQN MAP] Failed to parse file: {p}\nError: {summary['error']}\n")
+            continue
+        pkg = summary["package"]
+        for name in summary["types"]:
+            key = f"{pkg}.{name}" if pkg else name
+            fqn_map[key] = p
     return fqn_map
 
 
-def extract_type_names(cu):
-    fq_imports, wildcard_pkgs, simple_names = set(), set(), set()
-
-    for imp in cu.getImports():
-        name = str(imp.getNameAsString())
-        if imp.isAsterisk():
-            wildcard_pkgs.add(name)
-        else:
-            fq_imports.add(name)
-
-    for cid in cu.findAll(ClassOrInterfaceDeclaration):
-        for t in cid.getExtendedTypes():
-            simple_names.add(t.getNameAsString())
-        for t in cid.getImplementedTypes():
-            simple_names.add(t.getNameAsString())
-    for ann in cu.findAll(AnnotationDeclaration):
-        simple_names.add(ann.getNameAsString())
-    for vd in cu.findAll(VariableDeclarationExpr):
-        simple_names.add(vd.getElementType().asString())
-    for oc in cu.findAll(ObjectCreationExpr):
-        simple_names.add(oc.getType().getNameAsString())
-    for io in cu.findAll(InstanceOfExpr):
-        simple_names.add(io.getType().asString())
-    for c in cu.findAll(CastExpr):
-        simple_names.add(c.getType().asString())
-    for cl in cu.findAll(ClassExpr):
-        simple_names.add(cl.getType().asString())
-    for mr in cu.findAll(MethodReferenceExpr):
-        if mr.getScope().isTypeExpr():
-            simple_names.add(mr.getScope().asTypeExpr().getType().asString())
-    for mc in cu.findAll(MethodCallExpr):
-        if mc.getScope().isPresent() and isinstance(mc.getScope().get(), NameExpr):
-            simple_names.add(mc.getScope().get().getNameAsString())
-    for rt in cu.findAll(ReferenceType):
-        simple_names.add(rt.getElementType().asString())
-
-    return fq_imports, wildcard_pkgs, simple_names
+def extract_type_names(summary):
+    return (
+        set(summary["fq_imports"]),
+        set(summary["wildcard_pkgs"]),
+        set(summary["simple_names"]) | set(summary["scope_names"])
+    )
 
 
 def build_dependencies(project_root):
@@ -169,10 +129,12 @@ def build_dependencies(project_root):
         if candidate_path != src_path:
             deps_set.add(candidate_path)
     for src in find_java_files(project_root):
-        cu = StaticJavaParser.parse(JString(read_file(src)))
-        fq_imports, wildcard_pkgs, simple_names = extract_type_names(cu)
+        summary = get_summary(read_file(src))
+        if not summary["parsed"]:
+            raise ValueError(f"Failed to parse file: {src}\nError: {summary['error']}")
+        fq_imports, wildcard_pkgs, simple_names = extract_type_names(summary)
         file_deps, covered_simple = set(), set()
-        current_pkg = cu.getPackageDeclaration().map(lambda p: p.getNameAsString()).orElse("")
+        current_pkg = summary["package"]
 
         for fqn in fq_imports:
             simple = fqn.split('.')[-1]
@@ -217,54 +179,73 @@ def build_dependencies(project_root):
     return deps
 
 
-def process_projects(metadata):
+def load_dependencies(metadata, cleaned_dir=CLEANED_DIR, dependency_cache_file=DEPENDENCY_CACHE_FILE):
     # Load or build dependency cache
-    if os.path.exists(DEPENDENCY_CACHE_FILE):
-        with open(DEPENDENCY_CACHE_FILE, "r", encoding="utf-8") as f:
-            all_dependencies = json.load(f)
-    else:
-        all_dependencies = {}
-        for project_info in metadata:
-            project_name = project_info["project_id"]
-            project_path = str(Path(CLEANED_DIR) / project_name)
+    if os.path.exists(dependency_cache_file):
+        with open(dependency_cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    all_dependencies = {}
+    for project_info in metadata:
+        project_name = project_info["project_id"]
+        project_path = str(Path(cleaned_dir) / project_name)
+        with metrics.timer("dependencies.project_seconds"):
             deps = build_dependencies(project_path)
-            all_dependencies[project_name] = deps
-        with open(DEPENDENCY_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_dependencies, f, indent=2)
+        all_dependencies[project_name] = deps
+    with open(dependency_cache_file, "w", encoding="utf-8") as f:
+        json.dump(all_dependencies, f, indent=2)
+    return all_dependencies
+
+
+def build_project_chunks(project_id, project_path, dependency_map, cleaned_dir=CLEANED_DIR):
+    file_contents = {}
+    for java_file in find_java_files(project_path):
+        file_contents[java_file] = read_file(java_file)
+
+    chunks = []
+    for main_path in dependency_map:
+        main_file_content = clean_java_code(file_contents.get(main_path, ""))
+        dep_paths = dependency_map[main_path]
+        dependencies = [
+            {
+                "file_path": str(Path(dep).relative_to(cleaned_dir)),
+                "file_content": clean_java_code(file_contents.get(dep, ""))
+            }
+            for dep in dep_paths if dep in file_contents
+        ]
+        rel_main_path = str(Path(main_path).relative_to(cleaned_dir))
+        chunks.extend(generate_chunks(project_id, rel_main_path, main_file_content, dependencies))
+    return chunks
+
+
+def write_chunks(target_file, chunks):
+    target_file.write("".join(
+        json.dumps(chunk, ensure_ascii=False, separators=(',', ':')) + "\n" for chunk in chunks
+    ))
+
+
+def process_projects(metadata, cleaned_dir=CLEANED_DIR, dependency_cache_file=DEPENDENCY_CACHE_FILE,
+                     output_dir=".", first_project_id=133):
+    all_dependencies = load_dependencies(metadata, cleaned_dir, dependency_cache_file)
 
     # Output files
-    small_file = open("small.jsonl", "a", encoding="utf-8")
-    medium_file = open("medium.jsonl", "a", encoding="utf-8")
-    large_file = open("large.jsonl", "a", encoding="utf-8")
+    small_file = open(os.path.join(output_dir, "small.jsonl"), "a", encoding="utf-8")
+    medium_file = open(os.path.join(output_dir, "medium.jsonl"), "a", encoding="utf-8")
+    large_file = open(os.path.join(output_dir, "large.jsonl"), "a", encoding="utf-8")
 
-    project_id = 133
+    project_id = first_project_id
     for project_info in metadata:
         project_name = project_info["project_id"]
         size_class = project_info["project_size"]
-        project_path = str(Path(CLEANED_DIR) / project_name)
-
-        file_contents = {}
-        for java_file in Path(project_path).rglob("*.java"):
-            file_contents[str(java_file)] = read_file(java_file)
+        project_path = str(Path(cleaned_dir) / project_name)
 
         dependency_map = all_dependencies.get(project_name, {})
+        with metrics.timer("chunks.project_seconds"):
+            chunks = build_project_chunks(project_id, project_path, dependency_map, cleaned_dir)
+        metrics.incr(f"chunks.{size_class}", len(chunks))
 
-        for main_path in dependency_map:
-            main_file_content = clean_java_code(file_contents.get(main_path, ""))
-            dep_paths = dependency_map[main_path]
-            dependencies = [
-                {
-                    "file_path": str(Path(dep).relative_to(CLEANED_DIR)),
-                    "file_content": clean_java_code(file_contents.get(dep, ""))
-                }
-                for dep in dep_paths if dep in file_contents
-            ]
-            rel_main_path = str(Path(main_path).relative_to(CLEANED_DIR))
-            chunks = generate_chunks(project_id, rel_main_path, main_file_content, dependencies)
-
-            target_file = {"small": small_file, "medium": medium_file, "large": large_file}[size_class]
-            for chunk in chunks:
-                target_file.write(json.dumps(chunk, ensure_ascii=False, separators=(',', ':')) + "\n")
+        target_file = {"small": small_file, "medium": medium_file, "large": large_file}[size_class]
+        write_chunks(target_file, chunks)
 
         project_id += 1
 
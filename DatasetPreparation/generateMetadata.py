@@ -1,18 +1,24 @@
 import os
 import json
 import re
+import argparse
 import tiktoken
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from javaFileIndex import load_index, store_index
+import pipelineMetrics as metrics
 
 RAW_PROJECTS_DIR = "miniDataset"
 CLEANED_DIR = "New folder2"
 METADATA_FILE = "datasetMetadata2.json"
 TOKENIZER = tiktoken.get_encoding("cl100k_base")
+WRITE_BUFFER_SIZE = 1 << 20
+SIZE_THRESHOLDS = (8000, 20000)
 
 def classify_project(token_count):
-    if token_count <= 8000:
+    if token_count <= SIZE_THRESHOLDS[0]:
         return "small"
-    elif token_count <= 20000:
+    elif token_count <= SIZE_THRESHOLDS[1]:
         return "medium"
     else:
         return "large"
@@ -28,54 +34,88 @@ def clean_java_code(code: str) -> str:
 def count_tokens(text):
     return len(TOKENIZER.encode(text))
 
-def process_projects():
-    metadata = []
-    os.makedirs(CLEANED_DIR, exist_ok=True)
 
-    for project_name in os.listdir(RAW_PROJECTS_DIR):
-        project_path = Path(RAW_PROJECTS_DIR) / project_name
-        if not project_path.is_dir():
-            continue
-
-        cleaned_project_path = Path(CLEANED_DIR) / project_name
-        os.makedirs(cleaned_project_path, exist_ok=True)
+def count_tokens_batch(texts):
+    return [len(tokens) for tokens in TOKENIZER.encode_batch(texts)]
 
-        total_tokens = 0
-        java_files = []
 
-        for java_file in project_path.rglob("*.java"):
-            if not java_file.is_file():
-                continue
-
-            rel_path = java_file.relative_to(project_path)
-            cleaned_file_path = cleaned_project_path / rel_path
-
-            os.makedirs(cleaned_file_path.parent, exist_ok=True)
+def process_project(project_path, cleaned_project_path):
+    """Clean, tokenize and write every Java file of one project; returns its metadata entry."""
+    project_path = Path(project_path)
+    cleaned_project_path = Path(cleaned_project_path)
+    os.makedirs(cleaned_project_path, exist_ok=True)
 
+    index = load_index(project_path)
+    rel_paths, cleaned_codes = [], []
+    with metrics.timer("metadata.clean_seconds"):
+        for java_file in map(Path, index.paths()):
             with open(java_file, "r", encoding="utf-8", errors="ignore") as f:
                 raw_code = f.read()
 
-            cleaned_code = clean_java_code(raw_code)
-            token_count = count_tokens(cleaned_code)
-            total_tokens += token_count
-
-            with open(cleaned_file_path, "w", encoding="utf-8") as f:
-                f.write(cleaned_code)
-
-            java_files.append(str(rel_path))
-
-        project_size = classify_project(total_tokens)
-        metadata.append({
-            "project_id": project_name,
-            "total_tokens": total_tokens,
-            "project_size": project_size,
-            "java_files": java_files
-        })
+            rel_paths.append(java_file.relative_to(project_path))
+            cleaned_codes.append(clean_java_code(raw_code))
+
+    with metrics.timer("metadata.tokenize_seconds"):
+        # total_tokens is read downstream as an exact count, so it is never estimated
+        total_tokens = sum(count_tokens_batch(cleaned_codes)) if cleaned_codes else 0
+    project_size = classify_project(total_tokens)
+    metrics.incr("metadata.files", len(rel_paths))
+    metrics.incr(f"metadata.projects.{project_size}")
+    metrics.observe("metadata.project_tokens", total_tokens)
+
+    for rel_path, cleaned_code in zip(rel_paths, cleaned_codes):
+        cleaned_file_path = cleaned_project_path / rel_path
+        os.makedirs(cleaned_file_path.parent, exist_ok=True)
+        with open(cleaned_file_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(cleaned_code)
+    # The cleaned tree holds the same files, so later stages reuse this scan instead of their own
+    store_index(index.mirror(cleaned_project_path))
+
+    return {
+        "project_id": project_path.name,
+        "total_tokens": total_tokens,
+        "project_size": project_size,
+        "java_files": [str(p) for p in rel_paths]
+    }
+
+
+def _process_project_args(args):
+    # Drop anything inherited from the parent on fork so each job ships back only its own metrics
+    metrics.drain()
+    return process_project(*args), metrics.drain()
+
+
+def process_projects(raw_dir=RAW_PROJECTS_DIR, cleaned_dir=CLEANED_DIR, metadata_file=METADATA_FILE, workers=1):
+    os.makedirs(cleaned_dir, exist_ok=True)
+
+    jobs = []
+    for project_name in sorted(os.listdir(raw_dir)):
+        project_path = Path(raw_dir) / project_name
+        if not project_path.is_dir():
+            continue
+        jobs.append((str(project_path), str(Path(cleaned_dir) / project_name)))
+
+    if workers > 1:
+        # map() keeps project order, so metadata matches the serial run
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            metadata = []
+            for entry, worker_metrics in pool.map(_process_project_args, jobs, chunksize=1):
+                metadata.append(entry)
+                metrics.merge(worker_metrics)
+    else:
+        metadata = [process_project(*job) for job in jobs]
 
-    with open(METADATA_FILE, "w", encoding="utf-8") as f:
+    with open(metadata_file, "w", encoding="utf-8") as f:
         json.dump(metadata, f, indent=2)
 
-    print(f"Processed {len(metadata)} projects. Metadata saved to {METADATA_FILE}.")
+    print(f"Processed {len(metadata)} projects. Metadata saved to {metadata_file}.")
+    return metadata
 
 if __name__ == "__main__":
-    process_projects()
+    parser = argparse.ArgumentParser(description="Clean Java projects and generate token metadata.")
+    parser.add_argument("--raw-dir", default=RAW_PROJECTS_DIR)
+    parser.add_argument("--cleaned-dir", default=CLEANED_DIR)
+    parser.add_argument("--metadata-file", default=METADATA_FILE)
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (1 = serial).")
+    args = parser.parse_args()
+    process_projects(args.raw_dir, args.cleaned_dir, args.metadata_file, args.workers)
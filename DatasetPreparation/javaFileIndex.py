@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Indexes are kept outside the projects so input trees are never written to
+CACHE_DIR = os.environ.get("JAVA_FILE_INDEX_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".javaFileIndex"))
+INDEX_VERSION = 2
+MODULE_MARKERS = ("pom.xml", "build.gradle", "build.gradle.kts")
+# Skipped anywhere in the tree
+VCS_DIRS = {".git", ".svn", ".hg", "node_modules", ".idea", ".gradle", ".mvn"}
+# Skipped only directly under a module root, so packages named e.g. `build` are kept
+BUILD_DIRS = {"target", "build", "out", "bin"}
+SOURCE_SUBDIRS = ("src/main/java", "src/test/java")
+
+_loaded = {}
+
+
+class JavaFileIndex:
+    """Single-scan listing of a project's .java files with size, mtime and module roots."""
+
+    def __init__(self, root, files, module_roots, dirs):
+        self.root = str(root)
+        self.files = files                # {relative path: [size, mtime_ns]}
+        self.module_roots = module_roots  # relative dirs holding a build marker ("" = project root)
+        self.dirs = dirs                  # {relative dir: mtime_ns}, used to detect stale indexes
+
+    def paths(self):
+        """All indexed .java files as `str(Path(root) / rel)`, sorted."""
+        return [str(Path(self.root) / rel) for rel in sorted(self.files)]
+
+    def module_source_paths(self):
+        """
+        Files under src/main/java or src/test/java of each module, or the whole module when it has
+        neither; falls back to every file when the project has no build markers.
+        """
+        if not self.module_roots:
+            return self.paths()
+        selected = set()
+        for module in self.module_roots:
+            prefix = f"{module}/" if module else ""
+            bases = [f"{prefix}{sub}/" for sub in SOURCE_SUBDIRS if f"{prefix}{sub}" in self.dirs]
+            if not bases:
+                bases = [prefix]
+            selected.update(rel for rel in self.files if any(rel.startswith(b) for b in bases))
+        return [str(Path(self.root) / rel) for rel in sorted(selected)]
+
+    def is_stale(self):
+        """True when files were added, removed or renamed (directory mtimes) or edited in place"""
+        try:
+            for rel, mtime_ns in self.dirs.items():
+                if os.stat(os.path.join(self.root, rel)).st_mtime_ns != mtime_ns:
+                    return True
+            for rel, (size, mtime_ns) in self.files.items():
+                st = os.stat(os.path.join(self.root, rel))
+                if st.st_size != size or st.st_mtime_ns != mtime_ns:
+                    return True
+        except OSError:
+            return True
+        return False
+
+    def mirror(self, root):
+        """
+        Index of a copy of this tree's .java files under `root` (the cleaned projects written by
+        generateMetadata), built from stats of those files instead of a second scan. Module roots
+        carry over, since build files are not copied.
+        """
+        root = str(root)
+        files, dirs = {}, {"": os.stat(root).st_mtime_ns}
+        for rel in self.files:
+            st = os.stat(os.path.join(root, rel))
+            files[rel] = [st.st_size, st.st_mtime_ns]
+            parent = rel.rpartition("/")[0]
+            while parent not in dirs:
+                dirs[parent] = os.stat(os.path.join(root, parent)).st_mtime_ns
+                parent = parent.rpartition("/")[0]
+        return JavaFileIndex(root, files, list(self.module_roots), dirs)
+
+    def to_dict(self):
+        return {"version": INDEX_VERSION, "files": self.files, "module_roots": self.module_roots, "dirs": self.dirs}
+
+    def save(self):
+        path = index_path(self.root)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write-then-rename so concurrent workers never read a half-written index
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+
+def index_path(root):
+    key = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def build_index(root):
+    root = str(root)
+    files, module_roots, dirs = {}, [], {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        abs_dir = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            dirs[rel_dir] = os.stat(abs_dir).st_mtime_ns
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            continue
+
+        names = {e.name for e in entries}
+        is_module = any(m in names for m in MODULE_MARKERS)
+        if is_module:
+            module_roots.append(rel_dir)
+
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in VCS_DIRS or ((is_module or not rel_dir) and entry.name in BUILD_DIRS):
+                    continue
+                stack.append(rel)
+            elif entry.name.endswith(".java") and entry.is_file():
+                st = entry.stat()
+                files[rel] = [st.st_size, st.st_mtime_ns]
+
+    return JavaFileIndex(root, files, sorted(module_roots), dirs)
+
+
+def store_index(index, persist=True):
+    """Makes `index` the one load_index returns for its root, in this process and (persisted) later ones"""
+    if persist:
+        try:
+            index.save()
+        except OSError:
+            pass
+    _loaded[os.path.abspath(index.root)] = index
+    return index
+
+
+def load_index(root, persist=True):
+    """
+    Returns the index of `root`, scanning at most once per process. A persisted index is reused
+    while none of its directories or files changed since it was written.
+    """
+    index = _loaded.get(os.path.abspath(root))
+    if index is not None and not index.is_stale():
+        return index
+
+    index = None
+    path = index_path(root)
+    if persist and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                index = JavaFileIndex(root, data["files"], data["module_roots"], data["dirs"])
+                if index.is_stale():
+                    index = None
+        except (OSError, ValueError, KeyError):
+            index = None
+
+    if index is None:
+        return store_index(build_index(root), persist)
+    _loaded[os.path.abspath(root)] = index
+    return index
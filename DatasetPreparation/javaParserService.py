@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Long-lived JavaParser daemon.
+
+One process keeps a warm JVM with JavaParser loaded and answers parse / extract / summarize /
+validate requests over a Unix socket, so pipeline scripts and their worker processes share a single
+JIT-compiled parser instead of each starting their own JVM.
+
+Protocol: every message is a 4-byte big-endian length followed by a UTF-8 JSON object.
+Requests carry an "op" field; responses carry "ok" plus the op's result or an "error".
+
+    python javaParserService.py serve [--socket PATH] [--idle-timeout SECONDS]
+    python javaParserService.py stop
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import socket
+import struct
+import argparse
+import threading
+import subprocess
+import socketserver
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JAR = os.path.join(BASE_DIR, "lib", "javaparser-core-3.25.4.jar")
+SOCKET_PATH = os.environ.get("JAVA_PARSER_SOCKET", "/tmp/codeaid-javaparser.sock")
+IDLE_TIMEOUT = 600
+STARTUP_TIMEOUT = 60
+
+_HEADER = struct.Struct(">I")
+
+
+# ========== Framing ==========
+
+def send_frame(sock, obj):
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        part = sock.recv(n - len(buf))
+        if not part:
+            raise ConnectionError("Parser service closed the connection")
+        buf += part
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+# ========== Server (JVM side) ==========
+
+class _Parser:
+    """Holds the JVM-side classes; only instantiated inside the daemon."""
+
+    def __init__(self):
+        import jpype
+        import jpype.imports
+        if not jpype.isJVMStarted():
+            jpype.startJVM(classpath=[JAR])
+
+        from jpype.types import JString
+        from com.github.javaparser import JavaParser, ParserConfiguration
+        from com.github.javaparser.ast.body import (
+            ClassOrInterfaceDeclaration, AnnotationDeclaration,
+            MethodDeclaration, ConstructorDeclaration, FieldDeclaration
+        )
+        from com.github.javaparser.ast.expr import (
+            ObjectCreationExpr, InstanceOfExpr, CastExpr, ClassExpr,
+            MethodReferenceExpr, VariableDeclarationExpr, MethodCallExpr, NameExpr,
+            FieldAccessExpr, ThisExpr
+        )
+        from com.github.javaparser.ast.stmt import ExpressionStmt, ReturnStmt
+        from com.github.javaparser.ast.type import ReferenceType
+
+        self.JString = JString
+        self.JavaParser = JavaParser
+        self.config = ParserConfiguration()
+        self.config.setLanguageLevel(ParserConfiguration.LanguageLevel.JAVA_17)
+        self.ClassOrInterfaceDeclaration = ClassOrInterfaceDeclaration
+        self.AnnotationDeclaration = AnnotationDeclaration
+        self.MethodDeclaration = MethodDeclaration
+        self.ConstructorDeclaration = ConstructorDeclaration
+        self.FieldDeclaration = FieldDeclaration
+        self.ObjectCreationExpr = ObjectCreationExpr
+        self.InstanceOfExpr = InstanceOfExpr
+        self.CastExpr = CastExpr
+        self.ClassExpr = ClassExpr
+        self.MethodReferenceExpr = MethodReferenceExpr
+        self.VariableDeclarationExpr = VariableDeclarationExpr
+        self.MethodCallExpr = MethodCallExpr
+        self.NameExpr = NameExpr
+        self.FieldAccessExpr = FieldAccessExpr
+        self.ThisExpr = ThisExpr
+        self.ExpressionStmt = ExpressionStmt
+        self.ReturnStmt = ReturnStmt
+        self.ReferenceType = ReferenceType
+        # JavaParser instances are not thread-safe; one per connection thread
+        self._local = threading.local()
+
+    def _parse(self, code):
+        parser = getattr(self._local, "parser", None)
+        if parser is None:
+            parser = self._local.parser = self.JavaParser(self.config)
+        result = parser.parse(self.JString(code))
+        if result.isSuccessful() and result.getResult().isPresent():
+            return result.getResult().get(), None
+        return None, str(result.getProblems())
+
+    def parse(self, code):
+        cu, error = self._parse(code)
+        if cu is None:
+            return {"ok": False, "error": error}
+        return {"ok": True, "package": self._package(cu), "types": [str(t.getNameAsString()) for t in cu.getTypes()]}
+
+    def extract(self, code):
+        cu, error = self._parse(code)
+        if cu is None:
+            return {"ok": False, "error": error}
+        fq_imports, wildcard_pkgs, simple_names, scope_names = self.extract_type_names(cu)
+        return {
+            "ok": True,
+            "package": self._package(cu),
+            "types": [str(t.getNameAsString()) for t in cu.getTypes()],
+            "fq_imports": sorted(fq_imports),
+            "wildcard_pkgs": sorted(wildcard_pkgs),
+            "simple_names": sorted(simple_names),
+            "scope_names": sorted(scope_names),
+        }
+
+    def summarize(self, code):
+        """Everything the pipeline stages need from one file, in a cacheable JSON form."""
+        cu, error = self._parse(code)
+        if cu is None:
+            return {"ok": True, "summary": {"parsed": False, "error": error}}
+        fq_imports, wildcard_pkgs, simple_names, scope_names = self.extract_type_names(cu)
+        members = [str(m.getDeclarationAsString(False, False, False)) for m in cu.findAll(self.MethodDeclaration)]
+        members += [str(c.getDeclarationAsString(False, False, False)) for c in cu.findAll(self.ConstructorDeclaration)]
+        for f in cu.findAll(self.FieldDeclaration):
+            members += [f"{v.getTypeAsString()} {v.getNameAsString()}" for v in f.getVariables()]
+        return {"ok": True, "summary": {
+            "parsed": True,
+            "package": self._package(cu),
+            "types": [str(t.getNameAsString()) for t in cu.getTypes()],
+            "fq_imports": sorted(fq_imports),
+            "wildcard_pkgs": sorted(wildcard_pkgs),
+            "simple_names": sorted(simple_names),
+            "scope_names": sorted(scope_names),
+            "members": members,
+            "coupling": self.coupling_signals(cu),
+        }}
+
+    def validate(self, codes):
+        return {"ok": True, "valid": [self._parse(code)[0] is not None for code in codes]}
+
+    @staticmethod
+    def _package(cu):
+        return str(cu.getPackageDeclaration().map(lambda d: d.getNameAsString()).orElse(""))
+
+    def extract_type_names(self, cu):
+        fq_imports, wildcard_pkgs, simple_names, scope_names = set(), set(), set(), set()
+
+        for imp in cu.getImports():
+            name = str(imp.getNameAsString())
+            if imp.isAsterisk():
+                wildcard_pkgs.add(name)
+            else:
+                fq_imports.add(name)
+
+        for cid in cu.findAll(self.ClassOrInterfaceDeclaration):
+            for t in cid.getExtendedTypes():
+                simple_names.add(str(t.getNameAsString()))
+            for t in cid.getImplementedTypes():
+                simple_names.add(str(t.getNameAsString()))
+        for ann in cu.findAll(self.AnnotationDeclaration):
+            simple_names.add(str(ann.getNameAsString()))
+        for vd in cu.findAll(self.VariableDeclarationExpr):
+            simple_names.add(str(vd.getElementType().asString()))
+        for oc in cu.findAll(self.ObjectCreationExpr):
+            simple_names.add(str(oc.getType().getNameAsString()))
+        for io in cu.findAll(self.InstanceOfExpr):
+            simple_names.add(str(io.getType().asString()))
+        for c in cu.findAll(self.CastExpr):
+            simple_names.add(str(c.getType().asString()))
+        for cl in cu.findAll(self.ClassExpr):
+            simple_names.add(str(cl.getType().asString()))
+        for mr in cu.findAll(self.MethodReferenceExpr):
+            if mr.getScope().isTypeExpr():
+                simple_names.add(str(mr.getScope().asTypeExpr().getType().asString()))
+        for rt in cu.findAll(self.ReferenceType):
+            simple_names.add(str(rt.getElementType().asString()))
+        # Static-call scopes (e.g. `Helper.run()`) are kept apart; not every stage counts them as type uses
+        for mc in cu.findAll(self.MethodCallExpr):
+            if mc.getScope().isPresent() and isinstance(mc.getScope().get(), self.NameExpr):
+                scope_names.add(str(mc.getScope().get().getNameAsString()))
+
+        return fq_imports, wildcard_pkgs, simple_names, scope_names
+
+    def coupling_signals(self, cu):
+        """
+        Cheap structural signals for coupling smells:
+          max_chain_depth       longest run of calls made on the result of another call
+          methods               [own, foreign] member accesses per method body
+          classes               [methods, delegating methods] per class
+          foreign_field_reads   field accesses on other (non-static) objects
+        """
+        max_chain_depth = 0
+        for mc in cu.findAll(self.MethodCallExpr):
+            depth, scope = 1, mc.getScope()
+            while scope.isPresent() and isinstance(scope.get(), self.MethodCallExpr):
+                depth += 1
+                scope = scope.get().getScope()
+            max_chain_depth = max(max_chain_depth, depth)
+
+        methods, classes = [], []
+        for cls in cu.findAll(self.ClassOrInterfaceDeclaration):
+            field_names = {str(v.getNameAsString()) for f in cls.getFields() for v in f.getVariables()}
+            bodies = [m.getBody().get() for m in cls.getMethods() if m.getBody().isPresent()]
+            delegating = 0
+            for body in bodies:
+                own = foreign = 0
+                for call in body.findAll(self.MethodCallExpr):
+                    scope = call.getScope()
+                    if not scope.isPresent() or isinstance(scope.get(), self.ThisExpr):
+                        own += 1
+                    else:
+                        foreign += 1
+                for fa in body.findAll(self.FieldAccessExpr):
+                    if isinstance(fa.getScope(), self.ThisExpr):
+                        own += 1
+                    elif not self._is_static_scope(fa.getScope()):
+                        foreign += 1
+                own += sum(1 for n in body.findAll(self.NameExpr) if str(n.getNameAsString()) in field_names)
+                methods.append([own, foreign])
+
+                statements = body.getStatements()
+                if statements.size() == 1:
+                    stmt = statements.get(0)
+                    expr = None
+                    if isinstance(stmt, self.ExpressionStmt):
+                        expr = stmt.getExpression()
+                    elif isinstance(stmt, self.ReturnStmt) and stmt.getExpression().isPresent():
+                        expr = stmt.getExpression().get()
+                    if (isinstance(expr, self.MethodCallExpr) and expr.getScope().isPresent()
+                            and not isinstance(expr.getScope().get(), self.ThisExpr)):
+                        delegating += 1
+            classes.append([len(bodies), delegating])
+
+        foreign_field_reads = sum(
+            1 for fa in cu.findAll(self.FieldAccessExpr)
+            if not isinstance(fa.getScope(), self.ThisExpr) and not self._is_static_scope(fa.getScope())
+        )
+        return {
+            "max_chain_depth": max_chain_depth,
+            "methods": methods,
+            "classes": classes,
+            "foreign_field_reads": foreign_field_reads,
+        }
+
+    def _is_static_scope(self, scope):
+        # `System.out`, `Color.RED`: capitalised names are type references, not objects
+        if isinstance(scope, self.NameExpr):
+            return str(scope.getNameAsString())[:1].isupper()
+        if isinstance(scope, self.FieldAccessExpr):
+            return str(scope.getNameAsString())[:1].isupper() or self._is_static_scope(scope.getScope())
+        return False
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            server.last_activity = time.monotonic()
+            op = request.get("op")
+            try:
+                if op == "ping":
+                    response = {"ok": True}
+                elif op == "parse":
+                    response = server.parser.parse(request["code"])
+                elif op == "extract":
+                    response = server.parser.extract(request["code"])
+                elif op == "summarize":
+                    response = server.parser.summarize(request["code"])
+                elif op == "validate":
+                    response = server.parser.validate(request["codes"])
+                elif op == "stop":
+                    send_frame(self.request, {"ok": True})
+                    threading.Thread(target=server.shutdown, daemon=True).start()
+                    return
+                else:
+                    response = {"ok": False, "error": f"Unknown op: {op}"}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            send_frame(self.request, response)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _try_connect(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return sock
+    except OSError:
+        sock.close()
+        return None
+
+
+def serve(socket_path=SOCKET_PATH, idle_timeout=IDLE_TIMEOUT):
+    if os.path.exists(socket_path):
+        # Only a stale socket file may be removed; a live one belongs to another daemon
+        sock = _try_connect(socket_path)
+        if sock is not None:
+            sock.close()
+            print(f"JavaParser service is already listening on {socket_path}")
+            return
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+    inode = os.stat(socket_path).st_ino
+    server.parser = _Parser()
+    server.last_activity = time.monotonic()
+
+    if idle_timeout:
+        def watch_idle():
+            while True:
+                time.sleep(min(idle_timeout, 5))
+                if time.monotonic() - server.last_activity > idle_timeout:
+                    server.shutdown()
+                    return
+        threading.Thread(target=watch_idle, daemon=True).start()
+
+    print(f"JavaParser service listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            if os.stat(socket_path).st_ino == inode:
+                os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+
+
+# ========== Client ==========
+
+class ParserUnavailable(ConnectionError):
+    """The daemon could not be started or reached, or dropped the connection"""
+
+
+class JavaParserClient:
+    """
+    Connects to the daemon on the first request, starting it in the background if nothing is
+    listening on the socket yet. Starting happens under a lock on `<socket>.lock`, so callers that
+    race to start it wait for the first one's daemon and connect to that. Threads share the client;
+    each concurrent request borrows its own connection from a small idle pool.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, autostart=True):
+        self.socket_path = socket_path
+        self.autostart = autostart
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _start_daemon(self):
+        with open(f"{self.socket_path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            sock = _try_connect(self.socket_path)
+            if sock is not None:
+                return sock
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "serve", "--socket", self.socket_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+            )
+            deadline = time.monotonic() + STARTUP_TIMEOUT
+            while sock is None and time.monotonic() < deadline and process.poll() is None:
+                time.sleep(0.2)
+                sock = _try_connect(self.socket_path)
+            return sock
+
+    def _connect(self):
+        sock = _try_connect(self.socket_path)
+        if sock is None and self.autostart:
+            sock = self._start_daemon()
+        if sock is None:
+            raise ParserUnavailable(f"JavaParser service is not reachable at {self.socket_path}")
+        return sock
+
+    def request(self, op, **payload):
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        if sock is None:
+            sock = self._connect()
+        try:
+            send_frame(sock, {"op": op, **payload})
+            response = recv_frame(sock)
+        except (ConnectionError, OSError) as e:
+            sock.close()
+            raise ParserUnavailable(f"JavaParser service connection failed: {e}") from e
+        with self._lock:
+            self._idle.append(sock)
+        return response
+
+    def parse(self, code):
+        return self.request("parse", code=code)
+
+    def extract(self, code):
+        return self.request("extract", code=code)
+
+    def _checked(self, op, **payload):
+        """Like `request`, but a failure inside the service raises instead of returning ok=False"""
+        response = self.request(op, **payload)
+        if not response.get("ok"):
+            raise RuntimeError(f"JavaParser service failed on {op}: {response.get('error')}")
+        return response
+
+    def summarize(self, code):
+        return self._checked("summarize", code=code)["summary"]
+
+    def validate(self, codes):
+        return self._checked("validate", codes=list(codes))["valid"]
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    One client per process, shared by its threads; forked worker processes never reuse the
+    parent's sockets.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client, _client_pid = JavaParserClient(), os.getpid()
+        return _client
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared JavaParser service.")
+    parser.add_argument("command", choices=["serve", "stop"])
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--idle-timeout", type=int, default=IDLE_TIMEOUT, help="Seconds; 0 keeps it running.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, args.idle_timeout)
+    else:
+        JavaParserClient(args.socket, autostart=False).request("stop")
@@ -0,0 +1,229 @@
+"""
+Offset index for JSONL chunk files keyed by (project_id, main file, chunk_id).
+
+`chunk_id` restarts at 0 for every main file, so (project_id, chunk_id) alone matches one chunk per
+main file of the project; the main file path is what makes a key unique. `build_index` scans a
+JSONL once and writes `<file>.idx` beside it: a small header with the source's size and mtime,
+then fixed-size (project_id, path hash, chunk_id, offset, length) records sorted by key.
+`IndexedJsonl` memory-maps both files, binary-searches the index and decodes only the selected
+lines, so fetching one chunk or one project costs O(selected records), not O(file).
+
+    python jsonlIndex.py build medium.jsonl rerun.jsonl
+    python jsonlIndex.py get medium.jsonl 140 3 --file src/main/java/App.java
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"JSONLIX2"
+HEADER = struct.Struct("<8sQQQ")   # magic, source size, source mtime_ns, record count
+RECORD = struct.Struct("<qQqQQ")   # project_id, main file path hash, chunk_id, offset, length
+KEY_PREFIX_BYTES = 256
+# Both ids come first in every record this pipeline writes, before any nested object
+KEY_RE = {
+    name: re.compile(rb'"' + name.encode() + rb'"\s*:\s*(-?\d+)')
+    for name in ("project_id", "chunk_id")
+}
+# The first main_file_path in a line is the record's own: the chunk content (detection) or its
+# "code" (refactoring) precedes everything else that could hold one
+PATH_RE = re.compile(rb'"main_file_path"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def index_path(path):
+    return f"{path}{INDEX_SUFFIX}"
+
+
+def path_hash(main_file_path):
+    if main_file_path is None:
+        return 0
+    return int.from_bytes(hashlib.blake2b(main_file_path.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _main_file_path(data):
+    content = data.get("content") or data.get("prompt") or {}
+    content = content.get("code", content) if isinstance(content, dict) else {}
+    return content.get("main_file_path") if isinstance(content, dict) else None
+
+
+def record_key(line):
+    """(project_id, main file path hash, chunk_id) of a raw JSONL line, or None when it has no integer ids"""
+    head = line[:KEY_PREFIX_BYTES]
+    nested = head.find(b"{", 1)
+    if nested != -1:
+        head = head[:nested]
+    found = [KEY_RE[name].search(head) for name in ("project_id", "chunk_id")]
+    path = PATH_RE.search(line)
+    if all(found) and path:
+        main_file_path = json.loads(b'"' + path.group(1) + b'"')
+        return int(found[0].group(1)), path_hash(main_file_path), int(found[1].group(1))
+    try:
+        data = json.loads(line)
+        return int(data["project_id"]), path_hash(_main_file_path(data)), int(data["chunk_id"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def build_index(path):
+    """Writes `<path>.idx`; returns the number of indexed lines"""
+    st = os.stat(path)
+    records, skipped, offset = [], 0, 0
+    with open(path, "rb") as f:
+        for line in f:
+            key = record_key(line) if line.strip() else None
+            if key is None:
+                skipped += line.strip() != b""
+            else:
+                records.append((*key, offset, len(line)))
+            offset += len(line)
+    records.sort()
+
+    tmp = f"{index_path(path)}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, st.st_size, st.st_mtime_ns, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(tmp, index_path(path))
+    if skipped:
+        print(f"[jsonlIndex] {path}: {skipped} lines without integer project_id/chunk_id were not indexed")
+    return len(records)
+
+
+def is_stale(path):
+    try:
+        with open(index_path(path), "rb") as f:
+            magic, size, mtime_ns, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return True
+    st = os.stat(path)
+    return magic != INDEX_MAGIC or size != st.st_size or mtime_ns != st.st_mtime_ns
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class IndexedJsonl:
+    """
+    Random access to a chunk JSONL; rebuilds a missing or stale index. A chunk is identified by
+    (project_id, main_file_path, chunk_id); (project_id, chunk_id) matches one chunk per main file.
+    """
+
+    def __init__(self, path, rebuild=True):
+        self.path = path
+        if is_stale(path):
+            if not rebuild:
+                raise ValueError(f"Index for {path} is missing or stale")
+            build_index(path)
+        self._index = _map(index_path(path))
+        self._data = _map(path)
+        _, _, _, self.count = HEADER.unpack_from(self._index, 0)
+
+    def close(self):
+        for m in (self._index, self._data):
+            if m is not None:
+                m.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._index, HEADER.size + i * RECORD.size)
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[:3] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _records(self, project_id, chunk_id=None, main_file_path=None):
+        if main_file_path is None:
+            start, prefix = (project_id, 0, -2**63), 1
+        else:
+            start = (project_id, path_hash(main_file_path), chunk_id if chunk_id is not None else -2**63)
+            prefix = 2
+        for i in range(self._lower_bound(start), self.count):
+            record = self._record(i)
+            if record[:prefix] != start[:prefix]:
+                return
+            if chunk_id is None or record[2] == chunk_id:
+                yield record
+
+    def raw_lines(self, project_id, chunk_id=None, main_file_path=None):
+        """
+        Undecoded lines of a project, narrowed to one main file and/or one chunk_id, in key then
+        file order. Without `main_file_path`, a chunk_id matches that chunk of every main file.
+        """
+        for record in self._records(project_id, chunk_id, main_file_path):
+            offset, length = record[3:]
+            yield self._data[offset:offset + length]
+
+    def get_all(self, project_id, chunk_id, main_file_path=None):
+        """Every record with this chunk_id in the project (or in one main file), reruns included"""
+        return [json.loads(line) for line in self.raw_lines(project_id, chunk_id, main_file_path)]
+
+    def get(self, project_id, main_file_path, chunk_id, default=None):
+        """Latest record for one chunk; reruns append, so the last line written wins"""
+        lines = list(self.raw_lines(project_id, chunk_id, main_file_path))
+        return json.loads(lines[-1]) if lines else default
+
+    def iter_project(self, project_id):
+        for line in self.raw_lines(project_id):
+            yield json.loads(line)
+
+    def iter_raw(self):
+        """(key, undecoded line) of every indexed line, in key then file order"""
+        for i in range(self.count):
+            record = self._record(i)
+            offset, length = record[3:]
+            yield record[:3], self._data[offset:offset + length]
+
+    def iter_keys(self, keys):
+        """Records for (project_id, main_file_path, chunk_id) keys in the given order; missing keys are skipped"""
+        for project_id, main_file_path, chunk_id in keys:
+            for line in self.raw_lines(project_id, chunk_id, main_file_path):
+                yield json.loads(line)
+
+    def keys(self):
+        """(project_id, main file path hash, chunk_id) of every indexed line"""
+        for i in range(self.count):
+            yield self._record(i)[:3]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query chunk offset indexes for JSONL files.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index one or more JSONL files.")
+    build.add_argument("paths", nargs="+")
+    get = sub.add_parser("get", help="Print the records of a project, a main file or a single chunk.")
+    get.add_argument("path")
+    get.add_argument("project_id", type=int)
+    get.add_argument("chunk_id", type=int, nargs="?")
+    get.add_argument("--file", help="Main file path; without it a chunk_id matches every main file's chunk.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for path in args.paths:
+            print(f"{path}: {build_index(path)} records indexed")
+    else:
+        with IndexedJsonl(args.path) as jsonl:
+            for line in jsonl.raw_lines(args.project_id, args.chunk_id, args.file):
+                sys.stdout.write(line.decode("utf-8"))
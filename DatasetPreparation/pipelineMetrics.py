@@ -0,0 +1,239 @@
+"""
+Lightweight metrics for the dataset and labelling scripts: timers, counters and histograms,
+plus an optional sampling profiler.
+
+Disabled by default, in which case every call returns immediately. Enable it from code with
+`enable("metrics.json")` or for any script with environment variables:
+
+    PIPELINE_METRICS=metrics.json PIPELINE_PROFILE=1 python generateInputJson.py
+
+The metrics file (and `<file>.stacks.txt` with collapsed stacks when profiling) is written when
+the process exits, or on demand with `write_metrics()`.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+RESERVOIR_SIZE = 4096
+PROFILE_INTERVAL = 0.005
+
+_enabled = False
+_metrics_file = None
+_lock = threading.Lock()
+_counters = Counter()
+_histograms = {}
+_profiler = None
+
+
+class _Histogram:
+    """count / sum / min / max plus a uniform reservoir sample for quantiles"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.sample = []
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.sample) < RESERVOIR_SIZE:
+            self.sample.append(value)
+        else:
+            i = random.randrange(self.count)
+            if i < RESERVOIR_SIZE:
+                self.sample[i] = value
+
+    def merge(self, other):
+        for value in other.get("sample", []):
+            if len(self.sample) < RESERVOIR_SIZE:
+                self.sample.append(value)
+        self.count += other["count"]
+        self.total += other["sum"]
+        if other["count"]:
+            self.min = other["min"] if self.min is None else min(self.min, other["min"])
+            self.max = other["max"] if self.max is None else max(self.max, other["max"])
+
+    def summary(self, with_sample=False):
+        ordered = sorted(self.sample)
+        def quantile(q):
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+        out = {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+            "max": self.max,
+        }
+        if with_sample:
+            out["sample"] = self.sample
+        return out
+
+
+class _SamplingProfiler:
+    """Samples every thread's Python stack at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def enable(metrics_file=None, profile=False, profile_interval=PROFILE_INTERVAL):
+    global _enabled, _metrics_file, _profiler
+    if not _enabled:
+        atexit.register(_write_at_exit)
+    _enabled = True
+    _metrics_file = metrics_file or _metrics_file
+    if profile and _profiler is None:
+        _profiler = _SamplingProfiler(profile_interval)
+        _profiler.start()
+
+
+def is_enabled():
+    return _enabled
+
+
+def incr(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += n
+
+
+def observe(name, value):
+    if not _enabled:
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = _Histogram()
+        hist.add(value)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+@contextmanager
+def _timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timer(name):
+    """`with timer("parse.file"):` records the block's duration (seconds) in histogram `name`"""
+    return _timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator form of `timer`"""
+    def decorate(fn):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _timer(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorate
+
+
+def drain():
+    """Returns and resets this process's metrics, e.g. to ship them from a worker process"""
+    with _lock:
+        snapshot = {
+            "counters": dict(_counters),
+            "histograms": {name: h.summary(with_sample=True) for name, h in _histograms.items()},
+        }
+        _counters.clear()
+        _histograms.clear()
+    return snapshot
+
+
+def merge(snapshot):
+    if not _enabled or not snapshot:
+        return
+    with _lock:
+        _counters.update(snapshot["counters"])
+        for name, data in snapshot["histograms"].items():
+            _histograms.setdefault(name, _Histogram()).merge(data)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "pid": os.getpid(),
+            "argv": sys.argv,
+            "counters": dict(sorted(_counters.items())),
+            "histograms": {name: h.summary() for name, h in sorted(_histograms.items())},
+        }
+
+
+def write_metrics(path=None):
+    path = path or _metrics_file
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+    if _profiler is not None:
+        _profiler.write(f"{path}.stacks.txt")
+
+
+def _write_at_exit():
+    if _profiler is not None:
+        _profiler.stop()
+    write_metrics()
+
+
+if os.environ.get("PIPELINE_METRICS"):
+    enable(os.environ["PIPELINE_METRICS"], profile=bool(os.environ.get("PIPELINE_PROFILE")))
@@ -0,0 +1,149 @@
+import os
+import json
+import math
+import argparse
+from pathlib import Path
+import pipelineMetrics as metrics
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokenCalibration.json")
+ENCODING = "cl100k_base"
+
+
+class TokenEstimator:
+    """
+    Linear bytes-to-tokens model with a lower and upper envelope:
+        lo = min_tokens_per_byte * bytes - lo_intercept
+        hi = max_tokens_per_byte * bytes + hi_intercept
+    The upper bound is also capped at the byte length, since every BPE token spans at least one byte.
+    """
+
+    def __init__(self, min_tokens_per_byte, lo_intercept, mean_tokens_per_byte, max_tokens_per_byte, hi_intercept):
+        self.min_tokens_per_byte = min_tokens_per_byte
+        self.lo_intercept = lo_intercept
+        self.mean_tokens_per_byte = mean_tokens_per_byte
+        self.max_tokens_per_byte = max_tokens_per_byte
+        self.hi_intercept = hi_intercept
+
+    def bounds(self, text):
+        n_bytes = len(text.encode("utf-8"))
+        if n_bytes == 0:
+            return 0, 0
+        lo = max(1, math.floor(self.min_tokens_per_byte * n_bytes - self.lo_intercept))
+        hi = min(n_bytes, math.ceil(self.max_tokens_per_byte * n_bytes + self.hi_intercept))
+        return lo, max(lo, hi)
+
+    def estimate(self, text):
+        lo, hi = self.bounds(text)
+        return min(hi, max(lo, round(self.mean_tokens_per_byte * len(text.encode("utf-8")))))
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def fit(cls, texts, count_tokens_batch, slack=0.02):
+        """Fit the envelope so that every calibration text lies inside it, widened by `slack`."""
+        samples = []
+        for text, tokens in zip(texts, count_tokens_batch(texts)):
+            n_bytes = len(text.encode("utf-8"))
+            if n_bytes:
+                samples.append((n_bytes, tokens))
+        if not samples:
+            raise ValueError("No non-empty texts to calibrate on")
+
+        # Slopes come from the larger files; intercepts absorb the small-file outliers
+        ratios = sorted(t / b for b, t in samples if b >= 256) or sorted(t / b for b, t in samples)
+        min_ratio = ratios[int(0.05 * (len(ratios) - 1))] * (1 - slack)
+        max_ratio = ratios[int(0.95 * (len(ratios) - 1))] * (1 + slack)
+        mean_ratio = sum(t for _, t in samples) / sum(b for b, _ in samples)
+        lo_intercept = max(0.0, max(min_ratio * b - t for b, t in samples))
+        hi_intercept = max(0.0, max(t - max_ratio * b for b, t in samples))
+        return cls(min_ratio, lo_intercept * (1 + slack), mean_ratio, max_ratio, hi_intercept * (1 + slack) + 1)
+
+    def save(self, path=CALIBRATION_FILE):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+class ExactCounter:
+    """Same interface as TokenEstimator, but encodes every text, so its bounds are the exact count"""
+
+    def __init__(self, encoding=ENCODING):
+        import tiktoken
+        self.tokenizer = tiktoken.get_encoding(encoding)
+
+    def bounds(self, text):
+        tokens = len(self.tokenizer.encode(text))
+        return tokens, tokens
+
+    def estimate(self, text):
+        return len(self.tokenizer.encode(text))
+
+
+def load_estimator(path=CALIBRATION_FILE):
+    """
+    The fitted estimator, or an ExactCounter when no calibration has been fitted with
+    `python tokenEstimator.py fit`: a guessed envelope would let estimated size classes and chunk
+    splits silently differ from exact counting.
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return TokenEstimator(**json.load(f))
+    return ExactCounter()
+
+
+def is_ambiguous(lo, hi, thresholds):
+    """True when a `count <= threshold` decision differs somewhere inside [lo, hi]."""
+    return any(lo <= t < hi for t in thresholds)
+
+
+class TokenCount:
+    """Token count of one text: an estimated [lo, hi] interval until resolved exactly."""
+
+    __slots__ = ("text", "lo", "hi")
+
+    def __init__(self, text, estimator):
+        self.text = text
+        self.lo, self.hi = estimator.bounds(text)
+
+    @property
+    def exact(self):
+        return self.lo == self.hi
+
+    def set_exact(self, tokens):
+        self.lo = self.hi = tokens
+
+
+def resolve(counts, count_tokens_batch):
+    pending = [c for c in counts if not c.exact]
+    if pending:
+        metrics.incr("tokens.exact_fallback_texts", len(pending))
+        for c, tokens in zip(pending, count_tokens_batch([c.text for c in pending])):
+            c.set_exact(tokens)
+
+
+def exceeds_budget(counts, budget, count_tokens_batch):
+    """Exact `sum(tokens) > budget`, encoding only when the estimate straddles the budget."""
+    lo = sum(c.lo for c in counts)
+    hi = sum(c.hi for c in counts)
+    if hi <= budget:
+        return False
+    if lo > budget:
+        return True
+    resolve(counts, count_tokens_batch)
+    return sum(c.lo for c in counts) > budget
+
+
+if __name__ == "__main__":
+    import tiktoken
+
+    parser = argparse.ArgumentParser(description="Fit the bytes-per-token envelope on a cleaned Java corpus.")
+    parser.add_argument("command", choices=["fit"])
+    parser.add_argument("cleaned_dir")
+    parser.add_argument("--output", default=CALIBRATION_FILE)
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.get_encoding(ENCODING)
+    texts = [p.read_text(encoding="utf-8", errors="ignore") for p in Path(args.cleaned_dir).rglob("*.java")]
+    estimator = TokenEstimator.fit(texts, lambda ts: [len(t) for t in tokenizer.encode_batch(ts)])
+    estimator.save(args.output)
+    print(f"Calibrated on {len(texts)} files: {json.dumps(estimator.to_dict())}")
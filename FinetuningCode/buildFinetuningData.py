@@ -0,0 +1,160 @@
+#! /usr/bin/env python3
+"""
+Streaming builder for the LLaMA-Factory finetuning files.
+
+Produces the same system / instruction / output records as the finetuning notebooks, but one
+record at a time, so memory stays bounded however large the labelled data is. The train/test
+split hashes `project_id`: every chunk of a project (and so every chunk of a main file) lands on
+the same side, and the split is identical on every run and every machine.
+
+    python buildFinetuningData.py couplingD-finetune-data CouplingDetection.jsonl --name couplingDetection_finetune
+"""
+import os
+import json
+import hashlib
+import argparse
+
+SYSTEM_MESSAGE = "\n".join([
+    "You are a senior software engineer.",
+    "Follow the provided `Task` by the user and the `Output Scheme` to generate the `Output JSON`.",
+    "Do not generate any introduction or conclusion."
+])
+LABEL_FIELDS = ("violations", "couplingSmells", "refactored_files")
+TEST_RATIO = 0.2
+SPLIT_SALT = "codeaid-split-v1"
+# Chunks the coupling pre-filter labelled empty without asking the model are not training negatives
+SKIP_LABELLED_BY = ("prefilter",)
+
+
+def is_test_project(project_id, test_ratio=TEST_RATIO, salt=SPLIT_SALT):
+    digest = hashlib.sha256(f"{salt}:{project_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2**64 < test_ratio
+
+
+def build_instruction(prompt_json, task, output_schema):
+    return '\n'.join([
+        "## Code:",
+        prompt_json,
+        "",
+        "# Task:",
+        task,
+        "# Output Scheme:",
+        output_schema,
+        "",
+        "# Output  :",
+        "```json"
+    ])
+
+
+def build_output(label_json):
+    return "\n".join([
+        "```json",
+        label_json,
+        "```"
+    ])
+
+
+def to_example(rec):
+    label_field = next(field for field in LABEL_FIELDS if field in rec)
+    return {
+        "system": SYSTEM_MESSAGE,
+        "instruction": build_instruction(json.dumps(rec["prompt"]), rec["task"], rec["output_schema"]),
+        "input": "",
+        "output": build_output(json.dumps(rec[label_field], ensure_ascii=False, default=str)),
+        "history": []
+    }
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                if rec.get("labelled_by") in SKIP_LABELLED_BY:
+                    continue
+                yield rec["project_id"], to_example(rec)
+
+
+def iter_parquet(path, batch_size=512):
+    # Exports from DataLableling/labelledParquet.py already hold the serialised prompt and label
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(path)
+    columns = ["project_id", "prompt", "task", "output_schema", "label"]
+    if "labelled_by" in parquet_file.schema_arrow.names:
+        columns.append("labelled_by")
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        for row in batch.to_pylist():
+            if row.get("labelled_by") in SKIP_LABELLED_BY:
+                continue
+            yield row["project_id"], {
+                "system": SYSTEM_MESSAGE,
+                "instruction": build_instruction(row["prompt"], row["task"], row["output_schema"]),
+                "input": "",
+                "output": build_output(row["label"]),
+                "history": []
+            }
+
+
+def iter_examples(paths):
+    for path in paths:
+        yield from (iter_parquet(path) if path.endswith(".parquet") else iter_jsonl(path))
+
+
+class JsonArrayWriter:
+    """Writes a JSON array one element at a time"""
+
+    def __init__(self, path):
+        self._f = open(path, "w", encoding="utf8")
+        self._f.write("[")
+        self.count = 0
+
+    def write(self, obj):
+        self._f.write(",\n" if self.count else "\n")
+        json.dump(obj, self._f, ensure_ascii=False, default=str)
+        self.count += 1
+
+    def close(self):
+        self._f.write("\n]\n")
+        self._f.close()
+
+
+def build_dataset(input_paths, output_dir, name=None, test_ratio=TEST_RATIO, salt=SPLIT_SALT):
+    """
+    Writes `train.json` and `test.json` into `output_dir`, plus a `dataset_info.json` fragment for
+    LLaMA-Factory when `name` is given. Returns the number of examples and projects per split.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writers = {split: JsonArrayWriter(os.path.join(output_dir, f"{split}.json")) for split in ("train", "test")}
+    projects = {"train": set(), "test": set()}
+    try:
+        for project_id, example in iter_examples(input_paths):
+            split = "test" if is_test_project(project_id, test_ratio, salt) else "train"
+            projects[split].add(project_id)
+            writers[split].write(example)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if name:
+        columns = {"prompt": "instruction", "query": "input", "response": "output", "system": "system",
+                   "history": "history"}
+        info = {f"{name}_{split}": {"file_name": os.path.abspath(os.path.join(output_dir, f"{split}.json")),
+                                    "columns": columns}
+                for split in writers}
+        with open(os.path.join(output_dir, "dataset_info.json"), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+
+    stats = {split: {"examples": writers[split].count, "projects": len(projects[split])} for split in writers}
+    print(json.dumps(stats))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build LLaMA-Factory train/test files from labelled data.")
+    parser.add_argument("output_dir")
+    parser.add_argument("inputs", nargs="+", help="Labelled JSONL files or labelledParquet exports.")
+    parser.add_argument("--name", help="Dataset name prefix for the dataset_info.json fragment.")
+    parser.add_argument("--test-ratio", type=float, default=TEST_RATIO)
+    parser.add_argument("--salt", default=SPLIT_SALT, help="Change to draw a different (still deterministic) split.")
+    args = parser.parse_args()
+    build_dataset(args.inputs, args.output_dir, args.name, args.test_ratio, args.salt)
@@ -0,0 +1,264 @@
+#! /usr/bin/env python3
+"""
+Token-length-aware packing of the LLaMA-Factory finetuning data.
+
+Each system / instruction / output example is tokenized with the Qwen chat template (prompt tokens
+masked out of the labels) and packed with best-fit decreasing into sequences of at most
+`seq_len` tokens. Examples are never split. Inside a packed sequence `attention_mask` holds
+the example's segment number (1, 2, ...) and `position_ids` restart at 0 for every example, which is
+the contamination-free layout LLaMA-Factory uses for `neat_packing`. So no example attends
+across a boundary.
+
+    python packFinetuningData.py couplingD-finetune-data/train.json packed/train.jsonl --seq-len 8192 \
+        --tokenized-dir packed/couplingDetection
+
+The input array is read one example at a time; only token ids are kept in memory. Packing
+statistics (sequences, padding and fill) are printed and written next to the output.
+
+LLaMA-Factory cannot read the JSONL directly. With `--tokenized-dir` the packed train split is also
+saved as the tokenized dataset LLaMA-Factory loads from `tokenized_path` (input_ids, attention_mask,
+labels), and `<output>.llamafactory.yaml` holds the keys to put in the QLoRA config in place of
+`dataset` / `eval_dataset`: `tokenized_path`, `neat_packing: true` (turns the segment numbers
+into a block-diagonal attention mask) and `cutoff_len`. LLaMA-Factory ignores the other data
+arguments when it loads a tokenized dataset, so eval_dataset is not used with it.
+"""
+import os
+import json
+import bisect
+import argparse
+from array import array
+
+from transformers import AutoTokenizer
+
+TOKENIZER_ID = "Qwen/Qwen2.5-14B-Instruct"
+SEQ_LEN = 8192
+# per_device_train_batch_size in the QLoRA configs. Gradient accumulation runs each micro-batch on
+# its own, so padding only ever fills a micro-batch of this size.
+BATCH_SIZE = 1
+IGNORE_INDEX = -100
+READ_SIZE = 1 << 20
+
+
+class TokenizedExample:
+    __slots__ = ("input_ids", "prompt_len")
+
+    def __init__(self, input_ids, prompt_len):
+        self.input_ids = array("i", input_ids)
+        self.prompt_len = prompt_len
+
+    def __len__(self):
+        return len(self.input_ids)
+
+
+def tokenize_example(tokenizer, example):
+    messages = [{"role": "system", "content": example["system"]},
+                {"role": "user", "content": example["instruction"] + example.get("input", "")}]
+    prompt_ids = tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=True)
+    if hasattr(prompt_ids, "keys"):
+        prompt_ids = prompt_ids["input_ids"]
+    response_ids = tokenizer.encode(example["output"], add_special_tokens=False) + [tokenizer.eos_token_id]
+    return TokenizedExample(list(prompt_ids) + response_ids, len(prompt_ids))
+
+
+def tokenize_examples(tokenizer, examples):
+    return [tokenize_example(tokenizer, example) for example in examples]
+
+
+def iter_json_array(path, read_size=READ_SIZE):
+    """Objects of a JSON array file (such as train.json), decoded one at a time"""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof, state = "", 0, False, "open"
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            need_more = pos == len(buf)
+            if not need_more and state == "open":
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} does not hold a JSON array")
+                pos, state = pos + 1, "first"
+            elif not need_more and (buf[pos] == "]" and state != "value"):
+                return
+            elif not need_more and state == "sep":
+                if buf[pos] != ",":
+                    raise ValueError(f"{path}: expected ',' or ']' at offset {pos}")
+                pos, state = pos + 1, "value"
+            elif not need_more:
+                try:
+                    example, pos = decoder.raw_decode(buf, pos)
+                    yield example
+                    state = "sep"
+                except ValueError:
+                    need_more = True
+            if need_more:
+                if eof:
+                    raise ValueError(f"{path} is not a complete JSON array")
+                # Read at least as much again, so a long example is not re-parsed many times
+                more = f.read(max(read_size, len(buf) - pos))
+                buf, pos, eof = buf[pos:] + more, 0, not more
+
+
+def pack(lengths, seq_len=SEQ_LEN):
+    """
+    Best-fit decreasing: returns bins as lists of example indices. An example longer than
+    `seq_len` gets a bin of its own instead of being truncated.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: (-lengths[i], i))
+    bins, free = [], []   # free: sorted (remaining capacity, bin index)
+    for i in order:
+        pos = bisect.bisect_left(free, (lengths[i], -1))
+        if pos < len(free):
+            remaining, b = free.pop(pos)
+            bins[b].append(i)
+            bisect.insort(free, (remaining - lengths[i], b))
+        else:
+            bins.append([i])
+            if lengths[i] < seq_len:
+                bisect.insort(free, (seq_len - lengths[i], len(bins) - 1))
+    return bins
+
+
+def packed_sequence(examples, indices):
+    input_ids, labels, attention_mask, position_ids = [], [], [], []
+    for segment, i in enumerate(indices, 1):
+        ex = examples[i]
+        input_ids += ex.input_ids
+        labels += [IGNORE_INDEX] * ex.prompt_len + list(ex.input_ids[ex.prompt_len:])
+        attention_mask += [segment] * len(ex)
+        position_ids += range(len(ex))
+    return {"input_ids": input_ids, "labels": labels, "attention_mask": attention_mask,
+            "position_ids": position_ids}
+
+
+def batch_padding(lengths, batch_size):
+    """
+    Pad tokens when consecutive groups of `batch_size` sequences are padded to their longest; always
+    0 at batch size 1, where packing saves forward passes (sequences) rather than padding.
+    """
+    padding = 0
+    for start in range(0, len(lengths), batch_size):
+        batch = lengths[start:start + batch_size]
+        padding += max(batch) * len(batch) - sum(batch)
+    return padding
+
+
+def packing_stats(lengths, bins, seq_len=SEQ_LEN, batch_size=BATCH_SIZE):
+    total = sum(lengths)
+    bin_lengths = [sum(lengths[i] for i in b) for b in bins]
+
+    def efficiency(padding):
+        return total / (total + padding) if total else 1.0
+
+    unpacked_padding = batch_padding(lengths, batch_size)
+    sorted_padding = batch_padding(sorted(lengths), batch_size)
+    packed_padding = batch_padding(bin_lengths, batch_size)
+    return {
+        "examples": len(lengths),
+        "tokens": total,
+        "min_length": min(lengths, default=0),
+        "mean_length": total / len(lengths) if lengths else 0,
+        "max_length": max(lengths, default=0),
+        "overlong_examples": sum(n > seq_len for n in lengths),
+        "seq_len": seq_len,
+        "batch_size": batch_size,
+        "unpacked": {"sequences": len(lengths), "padding_tokens": unpacked_padding,
+                     "efficiency": efficiency(unpacked_padding)},
+        "length_sorted": {"sequences": len(lengths), "padding_tokens": sorted_padding,
+                          "efficiency": efficiency(sorted_padding)},
+        "packed": {"sequences": len(bins), "padding_tokens": packed_padding,
+                   "efficiency": efficiency(packed_padding),
+                   "mean_fill": total / (len(bins) * seq_len) if bins else 0.0},
+    }
+
+
+def check_totals(examples, packed_path):
+    """
+    Re-reads the packed file and checks it holds exactly the unpacked tokens: same token and label
+    totals, and every segment identical to one tokenized example.
+    """
+    expected_tokens = sum(len(ex) for ex in examples)
+    expected_labels = sum(len(ex) - ex.prompt_len for ex in examples)
+    remaining = {}
+    for ex in examples:
+        key = ex.input_ids.tobytes()
+        remaining[key] = remaining.get(key, 0) + 1
+
+    tokens = labels = 0
+    with open(packed_path, "r", encoding="utf-8") as f:
+        for line in f:
+            seq = json.loads(line)
+            tokens += len(seq["input_ids"])
+            labels += sum(label != IGNORE_INDEX for label in seq["labels"])
+            if not (len(seq["input_ids"]) == len(seq["labels"]) == len(seq["attention_mask"])
+                    == len(seq["position_ids"])):
+                raise ValueError("Packed sequence columns differ in length")
+            start = 0
+            for end in range(1, len(seq["input_ids"]) + 1):
+                if end == len(seq["input_ids"]) or seq["attention_mask"][end] != seq["attention_mask"][start]:
+                    if seq["position_ids"][start:end] != list(range(end - start)):
+                        raise ValueError("position_ids do not restart at a segment boundary")
+                    key = array("i", seq["input_ids"][start:end]).tobytes()
+                    if not remaining.get(key):
+                        raise ValueError("Packed segment does not match any unpacked example")
+                    remaining[key] -= 1
+                    start = end
+
+    if tokens != expected_tokens or labels != expected_labels or any(remaining.values()):
+        raise ValueError(f"Token totals differ: packed {tokens} tokens / {labels} labels, "
+                         f"unpacked {expected_tokens} / {expected_labels}")
+    return {"tokens": tokens, "label_tokens": labels}
+
+
+def save_tokenized(packed_path, tokenized_dir):
+    """Saves the packed JSONL as the DatasetDict LLaMA-Factory loads from `tokenized_path`"""
+    from datasets import Dataset, DatasetDict
+
+    train = Dataset.from_json(packed_path).remove_columns(["position_ids"])
+    DatasetDict({"train": train}).save_to_disk(tokenized_dir)
+
+
+def write_llamafactory_config(path, tokenized_dir, seq_len):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("### dataset (packed by packFinetuningData.py; replaces dataset / eval_dataset)\n")
+        f.write(f"tokenized_path: {os.path.abspath(tokenized_dir)}\n")
+        f.write("neat_packing: true\n")
+        f.write(f"cutoff_len: {seq_len}\n")
+
+
+def pack_dataset(input_path, output_path, tokenizer_id=TOKENIZER_ID, seq_len=SEQ_LEN, batch_size=BATCH_SIZE,
+                 check=True, tokenized_dir=None):
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_id)
+    examples = tokenize_examples(tokenizer, iter_json_array(input_path))
+    lengths = [len(ex) for ex in examples]
+    bins = pack(lengths, seq_len)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for indices in bins:
+            f.write(json.dumps(packed_sequence(examples, indices)) + "\n")
+
+    stats = packing_stats(lengths, bins, seq_len, batch_size)
+    if check:
+        stats["check"] = check_totals(examples, output_path)
+    with open(f"{os.path.splitext(output_path)[0]}.stats.json", "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    if tokenized_dir:
+        save_tokenized(output_path, tokenized_dir)
+        write_llamafactory_config(f"{os.path.splitext(output_path)[0]}.llamafactory.yaml", tokenized_dir, seq_len)
+    print(json.dumps(stats, indent=2))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokenize and pack LLaMA-Factory examples up to a sequence length.")
+    parser.add_argument("input", help="train.json / test.json written by buildFinetuningData.py")
+    parser.add_argument("output", help="Packed JSONL (input_ids, labels, attention_mask, position_ids).")
+    parser.add_argument("--tokenizer", default=TOKENIZER_ID)
+    parser.add_argument("--seq-len", type=int, default=SEQ_LEN)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="per_device_train_batch_size for the padding stats (not including gradient accumulation).")
+    parser.add_argument("--no-check", action="store_true", help="Skip the packed vs unpacked token check.")
+    parser.add_argument("--tokenized-dir", help="Also save the packed data as a LLaMA-Factory tokenized dataset here.")
+    args = parser.parse_args()
+    pack_dataset(args.input, args.output, args.tokenizer, args.seq_len, args.batch_size, not args.no_check,
+                 args.tokenized_dir)
@@ -0,0 +1,64 @@
+#! /usr/bin/env python3
+"""
+Measures what reusing the shared-prefix KV cache buys in the evaluation harness.
+
+Runs the same records twice with greedy decoding, once recomputing the full prompt and once with
+the cached instruction prefix. It reports time to first token and throughput for both runs and
+checks that the outputs are identical. A tiny model on CPU is enough:
+
+    python benchmarkPrefixCache.py /path/to/tiny-model solid_detection data.jsonl --limit 16
+"""
+import os
+import json
+import argparse
+import tempfile
+from itertools import islice
+
+from evalHarness import load_model, run_eval, BATCH_SIZE
+
+
+def compare_prefix_cache(model, tokenizer, task, input_path, limit=16, batch_size=BATCH_SIZE, max_new_tokens=32):
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "sample.jsonl")
+        with open(input_path, "r", encoding="utf-8") as f_in, open(sample, "w", encoding="utf-8") as f_out:
+            f_out.writelines(islice((line for line in f_in if line.strip()), limit))
+
+        runs, outputs = {}, {}
+        for name, prefix_cache in (("full_prompt", False), ("prefix_cache", True)):
+            output_path = os.path.join(tmp, f"{name}.jsonl")
+            runs[name] = run_eval(model, tokenizer, task, sample, output_path, batch_size, max_new_tokens,
+                                  stop_on_fence=False, prefix_cache=prefix_cache, do_sample=False)
+            with open(output_path, "r", encoding="utf-8") as f:
+                outputs[name] = {row["index"]: row["output"] for row in map(json.loads, f)}
+
+    full, cached = runs["full_prompt"], runs["prefix_cache"]
+    report = {
+        "task": task,
+        "records": full["records"],
+        "prefix_tokens": cached["prefix_tokens"],
+        "prefix_build_seconds": cached["prefix_build_seconds"],
+        "mean_ttft_seconds": {"full_prompt": full["mean_ttft_seconds"], "prefix_cache": cached["mean_ttft_seconds"]},
+        "output_tokens_per_second": {"full_prompt": full["output_tokens_per_second"],
+                                     "prefix_cache": cached["output_tokens_per_second"]},
+        "total_seconds": {"full_prompt": full["seconds"], "prefix_cache": cached["seconds"]},
+        "ttft_speedup": (full["mean_ttft_seconds"] / cached["mean_ttft_seconds"]
+                         if cached["mean_ttft_seconds"] else None),
+        "identical_outputs": outputs["full_prompt"] == outputs["prefix_cache"],
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare evaluation with and without the shared-prefix KV cache.")
+    parser.add_argument("model")
+    parser.add_argument("task")
+    parser.add_argument("input")
+    parser.add_argument("--limit", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--device")
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model, args.device, dtype="float32")
+    compare_prefix_cache(model, tokenizer, args.task, args.input, args.limit, args.batch_size, args.max_new_tokens)
@@ -0,0 +1,257 @@
+#! /usr/bin/env python3
+"""
+Batched evaluation runner for any Hugging Face causal LM.
+
+Prompts are built with the notebook templates (evalPrompts.py), sorted by token length and
+generated in left-padded batches, so each batch pads to similar lengths. A sequence stops as soon
+as its JSON block is closed with a code fence instead of running on to `max_new_tokens`. Results
+are appended to the output JSONL after every batch. Rerunning with the same output file resumes:
+records already written are skipped.
+
+With `--prefix-cache` the task's static instruction block is run through the model once and
+its KV cache is reused by every batch. Each row is laid out as prefix, padding, record, so the
+cached prefix is identical for all rows and only the record part is prefilled.
+
+With `--constrained` every output is forced to match the task's pydantic schema
+(schemaConstraint.py) and ends with EOS as soon as the JSON closes, so no fence is needed.
+
+    python evalHarness.py CodeAid/solidV-Detection-model solid_detection data.jsonl outputFile1.jsonl --batch-size 8
+"""
+import os
+import re
+import copy
+import json
+import time
+import argparse
+
+import torch
+from transformers import (AutoModelForCausalLM, AutoTokenizer, LogitsProcessor, LogitsProcessorList,
+                          StoppingCriteria, StoppingCriteriaList)
+
+from evalPrompts import TASKS, build_prompt, prompt_prefix, output_schema
+from schemaConstraint import SchemaLogitsProcessor
+
+BATCH_SIZE = 8
+MAX_NEW_TOKENS = 8192
+# A fence right after the JSON's last bracket closes the output; "```json" only opens it
+CLOSING_FENCE_RE = re.compile(r"[\]}]\s*```")
+
+
+def load_model(model_id, device=None, dtype=None, **kwargs):
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(model_id, dtype=dtype or "auto", **kwargs).to(device)
+    model.eval()
+    return model, tokenizer
+
+
+class ClosingFenceCriteria(StoppingCriteria):
+    """Marks each sequence done once its generated text closes the JSON code fence"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.tails = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.tails is None:
+            self.tails = [""] * input_ids.shape[0]
+        done = []
+        # Decode only the newest token and keep a short rolling tail per sequence
+        for row, token in enumerate(input_ids[:, -1].tolist()):
+            self.tails[row] = (self.tails[row] + self.tokenizer.decode([token], skip_special_tokens=True))[-64:]
+            done.append(bool(CLOSING_FENCE_RE.search(self.tails[row])))
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class FirstTokenTimer(LogitsProcessor):
+    """Records when the first token's logits are ready, i.e. when prefill has finished"""
+
+    def __init__(self):
+        self.first_token_at = None
+
+    def __call__(self, input_ids, scores):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return scores
+
+
+class PrefixCache:
+    """KV cache of a task's static prompt prefix, computed once and copied for every batch"""
+
+    @torch.inference_mode()
+    def __init__(self, model, tokenizer, prefix):
+        self.input_ids = tokenizer(prefix)["input_ids"]
+        t0 = time.perf_counter()
+        self.cache = model(torch.tensor([self.input_ids], device=model.device), use_cache=True).past_key_values
+        self.build_seconds = time.perf_counter() - t0
+
+    def __len__(self):
+        return len(self.input_ids)
+
+    def for_batch(self, batch_size):
+        # generate() extends the cache in place, so every batch works on its own copy
+        cache = copy.deepcopy(self.cache)
+        if batch_size > 1:
+            cache.batch_repeat_interleave(batch_size)
+        return cache
+
+
+def trim_output(text):
+    """Drops anything the model produced after the closing fence"""
+    match = CLOSING_FENCE_RE.search(text)
+    return text[:match.end()] if match else text
+
+
+def pad_batch(tokenizer, sequences, prefix_len=0, device=None):
+    """
+    Pads every sequence to the same length. Padding goes right after the first `prefix_len`
+    tokens, which is plain left padding when there is no shared prefix.
+    """
+    width = max(len(ids) for ids in sequences)
+    input_ids, attention_mask = [], []
+    for ids in sequences:
+        pad = width - len(ids)
+        input_ids.append(ids[:prefix_len] + [tokenizer.pad_token_id] * pad + ids[prefix_len:])
+        attention_mask.append([1] * prefix_len + [0] * pad + [1] * (len(ids) - prefix_len))
+    return {"input_ids": torch.tensor(input_ids, device=device),
+            "attention_mask": torch.tensor(attention_mask, device=device)}
+
+
+def read_records(input_path):
+    with open(input_path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if line.strip():
+                yield index, json.loads(line)
+
+
+def completed_indices(output_path):
+    """Indices already in the output. A partly written last line (from a crash) is cut off."""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.splitlines():
+        try:
+            done.add(json.loads(line)["index"])
+        except (ValueError, KeyError):
+            continue
+    return done
+
+
+def length_sorted_batches(items, batch_size):
+    """Longest first, so an out-of-memory batch shows up at the start of the run"""
+    ordered = sorted(items, key=lambda item: -len(item["input_ids"]))
+    return [ordered[i:i + batch_size] for i in range(0, len(ordered), batch_size)]
+
+
+@torch.inference_mode()
+def generate_batch(model, tokenizer, batch, max_new_tokens=MAX_NEW_TOKENS, stop_on_fence=True, prefix_cache=None,
+                   schema=None, **generation_kwargs):
+    """Returns ([(item, text, output_tokens)], seconds to first token). `schema` constrains the output."""
+    t0 = time.perf_counter()
+    prefix_len = len(prefix_cache) if prefix_cache else 0
+    encoded = pad_batch(tokenizer, [item["input_ids"] for item in batch], prefix_len, model.device)
+    if prefix_cache:
+        generation_kwargs["past_key_values"] = prefix_cache.for_batch(len(batch))
+    prompt_len = encoded["input_ids"].shape[1]
+    stopping = StoppingCriteriaList([ClosingFenceCriteria(tokenizer)]) if stop_on_fence else None
+    timer = FirstTokenTimer()
+    processors = LogitsProcessorList([timer])
+    if schema is not None:
+        processors.append(SchemaLogitsProcessor(tokenizer, schema, max_new_tokens))
+        # The constraint ends every output with the tokenizer's EOS, so that is the one to stop on
+        generation_kwargs.setdefault("eos_token_id", tokenizer.eos_token_id)
+    outputs = model.generate(**encoded, max_new_tokens=max_new_tokens, stopping_criteria=stopping,
+                             logits_processor=processors, pad_token_id=tokenizer.pad_token_id,
+                             **generation_kwargs)
+    results = []
+    for item, ids in zip(batch, outputs[:, prompt_len:].tolist()):
+        # Finished sequences are filled with padding until the whole batch stops
+        end = next((i for i, t in enumerate(ids) if t in (tokenizer.pad_token_id, tokenizer.eos_token_id)), len(ids))
+        ids = ids[:end]
+        text = tokenizer.decode(ids, skip_special_tokens=True).strip()
+        results.append((item, trim_output(text) if stop_on_fence else text, len(ids)))
+    return results, timer.first_token_at - t0
+
+
+def prompt_ids(tokenizer, task, data, prefix_cache=None):
+    prompt = build_prompt(task, data)
+    if prefix_cache is None:
+        return tokenizer(prompt)["input_ids"]
+    # Tokenize the record part on its own so the prefix tokens match the cached ones exactly
+    return prefix_cache.input_ids + tokenizer(prompt[len(prompt_prefix(task)):], add_special_tokens=False)["input_ids"]
+
+
+def run_eval(model, tokenizer, task, input_path, output_path, batch_size=BATCH_SIZE, max_new_tokens=MAX_NEW_TOKENS,
+             stop_on_fence=True, prefix_cache=False, constrained=False, **generation_kwargs):
+    if task not in TASKS:
+        raise ValueError(f"Unknown task {task}; expected one of {sorted(TASKS)}")
+    schema = output_schema(task) if constrained else None
+    stop_on_fence = stop_on_fence and not constrained
+    done = completed_indices(output_path)
+    cache = PrefixCache(model, tokenizer, prompt_prefix(task)) if prefix_cache else None
+    items = []
+    for index, data in read_records(input_path):
+        if index in done:
+            continue
+        items.append({"index": index, "project_id": data.get("project_id"), "chunk_id": data.get("chunk_id"),
+                      "input_ids": prompt_ids(tokenizer, task, data, cache)})
+    print(f"{len(done)} records already done, {len(items)} to generate")
+
+    start, generated, ttfts = time.perf_counter(), 0, []
+    with open(output_path, "a", encoding="utf-8") as f_out:
+        for batch in length_sorted_batches(items, batch_size):
+            t0 = time.perf_counter()
+            results, ttft = generate_batch(model, tokenizer, batch, max_new_tokens, stop_on_fence, cache, schema,
+                                           **generation_kwargs)
+            seconds = time.perf_counter() - t0
+            ttfts.append(ttft)
+            for item, text, output_tokens in results:
+                f_out.write(json.dumps({
+                    "index": item["index"],
+                    "project_id": item["project_id"],
+                    "chunk_id": item["chunk_id"],
+                    "output": text,
+                    "prompt_tokens": len(item["input_ids"]),
+                    "output_tokens": output_tokens,
+                    "batch_seconds": round(seconds, 3),
+                    "ttft_seconds": round(ttft, 3),
+                }) + "\n")
+                generated += output_tokens
+            f_out.flush()
+            print(f"batch of {len(batch)} in {seconds:.1f}s (first token after {ttft:.2f}s)")
+
+    elapsed = time.perf_counter() - start
+    stats = {"records": len(items), "output_tokens": generated, "seconds": round(elapsed, 3),
+             "output_tokens_per_second": generated / elapsed if elapsed else 0.0,
+             "mean_ttft_seconds": sum(ttfts) / len(ttfts) if ttfts else None,
+             "prefix_tokens": len(cache) if cache else 0,
+             "prefix_build_seconds": cache.build_seconds if cache else None}
+    print(json.dumps(stats))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched, resumable evaluation of a causal LM on the test prompts.")
+    parser.add_argument("model")
+    parser.add_argument("task", choices=sorted(TASKS))
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-new-tokens", type=int, default=MAX_NEW_TOKENS)
+    parser.add_argument("--device")
+    parser.add_argument("--no-fence-stop", action="store_true", help="Generate until EOS or max_new_tokens.")
+    parser.add_argument("--prefix-cache", action="store_true", help="Reuse the KV cache of the shared instructions.")
+    parser.add_argument("--constrained", action="store_true", help="Force outputs to match the task's output schema.")
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model, args.device)
+    run_eval(model, tokenizer, args.task, args.input, args.output, args.batch_size, args.max_new_tokens,
+             not args.no_fence_stop, args.prefix_cache, args.constrained)
@@ -0,0 +1,294 @@
+#! /usr/bin/env python3
+"""
+Local HTTP server for the finetuned CodeAid models.
+
+Requests take the same chat messages the labelling modules build for `send_prompt`. Requests that
+arrive within `--batch-window` seconds of each other are generated together as one left-padded
+batch (evalHarness.generate_batch). Responses are cached by a hash of the messages, and a request
+identical to one still in flight waits for that one instead of generating again.
+
+    python inferenceServer.py CodeAid/solidV-Detection-model --port 8000
+
+    POST /generate  {"messages": [{"role": "user", "content": "..."}], "max_new_tokens": 2048}
+    GET  /metrics   throughput, latency and batching metrics (pipelineMetrics snapshot)
+    GET  /health
+
+Point the labelling scripts at it with CODEAID_SERVER_URL=http://127.0.0.1:8000.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from evalHarness import load_model, generate_batch, length_sorted_batches
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "DatasetPreparation"))
+import pipelineMetrics as metrics
+
+HOST = "127.0.0.1"
+PORT = 8000
+BATCH_SIZE = 8
+BATCH_WINDOW = 0.02
+MAX_NEW_TOKENS = 8192
+CACHE_SIZE = 1024
+# Gemini-style role names used by the labelling prompts
+ROLE_NAMES = {"model": "assistant"}
+
+
+def prompt_key(messages, max_new_tokens):
+    payload = json.dumps([messages, max_new_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU of finished responses"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        if not self.size:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class BatchingEngine:
+    """
+    Owns the model. `submit` is safe to call from any thread; a single worker thread collects
+    queued requests into batches and runs them.
+    """
+
+    def __init__(self, model, tokenizer, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW,
+                 max_new_tokens=MAX_NEW_TOKENS, cache_size=CACHE_SIZE, **generation_kwargs):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_new_tokens = max_new_tokens
+        self.generation_kwargs = generation_kwargs
+        self.cache = ResponseCache(cache_size)
+        self.started_at = time.time()
+        self._queue = queue.Queue()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def encode(self, messages):
+        messages = [{"role": ROLE_NAMES.get(msg["role"], msg["role"]), "content": msg["content"]}
+                    for msg in messages]
+        input_ids = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=True)
+        if hasattr(input_ids, "keys"):
+            input_ids = input_ids["input_ids"]
+        return list(input_ids)
+
+    def submit(self, messages, max_new_tokens=None):
+        """Returns a Future resolving to {"text", "output_tokens", "cached"}"""
+        max_new_tokens = max_new_tokens or self.max_new_tokens
+        key = prompt_key(messages, max_new_tokens)
+        metrics.incr("server.requests")
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.incr("server.cache_hits")
+            future = Future()
+            future.set_result(dict(cached, cached=True))
+            return future
+        with self._lock:
+            if key in self._in_flight:
+                metrics.incr("server.coalesced_requests")
+                return self._in_flight[key]
+            future = self._in_flight[key] = Future()
+        try:
+            item = {"key": key, "input_ids": self.encode(messages), "max_new_tokens": max_new_tokens,
+                    "queued_at": time.perf_counter()}
+        except Exception as e:
+            self._finish(key, error=e)
+            return future
+        self._queue.put(item)
+        return future
+
+    def _finish(self, key, result=None, error=None):
+        with self._lock:
+            future = self._in_flight.pop(key)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            self.cache.put(key, result)
+            future.set_result(dict(result, cached=False))
+
+    def _fail(self, items, error):
+        """Fails the futures of `items` that are still unanswered"""
+        with self._lock:
+            futures = [self._in_flight.pop(item["key"], None) for item in items]
+        futures = [future for future in futures if future is not None]
+        if futures:
+            metrics.incr("server.errors", len(futures))
+        for future in futures:
+            future.set_exception(error)
+
+    def _collect(self):
+        """Blocks for one request, then gathers whatever else arrives within the batch window"""
+        items = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(items) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        # The only thread answering requests, so nothing may escape it: a failed batch fails its
+        # own futures and the loop moves on to the next
+        while True:
+            items = self._collect()
+            try:
+                by_budget = {}
+                for item in items:
+                    by_budget.setdefault(item["max_new_tokens"], []).append(item)
+                for max_new_tokens, group in by_budget.items():
+                    for batch in length_sorted_batches(group, self.batch_size):
+                        self._generate(batch, max_new_tokens)
+            except Exception as e:
+                self._fail(items, e)
+
+    def _generate(self, batch, max_new_tokens):
+        started = time.perf_counter()
+        try:
+            for item in batch:
+                metrics.observe("server.queue_seconds", started - item["queued_at"])
+            results, ttft = generate_batch(self.model, self.tokenizer, batch, max_new_tokens,
+                                           **self.generation_kwargs)
+            seconds = time.perf_counter() - started
+            metrics.incr("server.batches")
+            metrics.observe("server.batch_size", len(batch))
+            metrics.observe("server.batch_seconds", seconds)
+            metrics.observe("server.ttft_seconds", ttft)
+            for item, text, output_tokens in results:
+                metrics.incr("server.generated_requests")
+                metrics.incr("server.output_tokens", output_tokens)
+                self._finish(item["key"], {"text": text, "output_tokens": output_tokens})
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        self._fail(batch, RuntimeError("The batch returned no output for this request"))
+
+    def stats(self):
+        snap = metrics.snapshot()
+        uptime = time.time() - self.started_at
+        counters = snap["counters"]
+        snap.update({
+            "uptime_seconds": uptime,
+            "requests_per_second": counters.get("server.requests", 0) / uptime,
+            "output_tokens_per_second": counters.get("server.output_tokens", 0) / uptime,
+            "cache_entries": len(self.cache),
+            "queued": self._queue.qsize(),
+        })
+        return snap
+
+
+def make_handler(engine):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._reply(200, engine.stats())
+            elif self.path == "/health":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/generate":
+                self._reply(404, {"error": f"Unknown path {self.path}"})
+                return
+            started = time.perf_counter()
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                messages = request["messages"]
+                if not isinstance(messages, list) or not all("role" in m and "content" in m for m in messages):
+                    raise ValueError("messages must be a list of {role, content}")
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            try:
+                result = engine.submit(messages, request.get("max_new_tokens")).result()
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+                return
+            seconds = time.perf_counter() - started
+            metrics.observe("server.request_seconds", seconds)
+            self._reply(200, dict(result, seconds=round(seconds, 4)))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(model_id, host=HOST, port=PORT, device=None, batch_size=BATCH_SIZE, batch_window=BATCH_WINDOW,
+          max_new_tokens=MAX_NEW_TOKENS, cache_size=CACHE_SIZE, metrics_file=None, **generation_kwargs):
+    """Builds the server; call `serve_forever()` on it (or `shutdown()` from another thread)"""
+    metrics.enable(metrics_file)
+    model, tokenizer = load_model(model_id, device)
+    engine = BatchingEngine(model, tokenizer, batch_size, batch_window, max_new_tokens, cache_size,
+                            **generation_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(engine))
+    server.engine = engine
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a finetuned model over HTTP with request batching.")
+    parser.add_argument("model")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--device")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW,
+                        help="Seconds to wait for more requests before running a batch.")
+    parser.add_argument("--max-new-tokens", type=int, default=MAX_NEW_TOKENS)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Cached responses; 0 disables the cache.")
+    parser.add_argument("--metrics", help="Also write the metrics to this file on exit.")
+    args = parser.parse_args()
+
+    server = serve(args.model, args.host, args.port, args.device, args.batch_size, args.batch_window,
+                   args.max_new_tokens, args.cache_size, args.metrics)
+    print(f"Serving {args.model} on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,324 @@
+"""
+Schema-constrained decoding for local inference.
+
+`SchemaLogitsProcessor` compiles a pydantic model's JSON schema into a character-level pushdown
+automaton and masks, at every step, the tokens that would take the output outside that schema.
+Outputs are therefore valid by construction. Once the JSON closes, only EOS is allowed, so
+generation ends there. The output is formatted as `json.dumps` formats it (", " and ": " separators,
+properties in schema order), which is also how the training labels were written.
+
+Given `max_new_tokens`, a token is also dropped when the shortest text that would still close the
+JSON after it no longer fits the remaining budget, so running out of tokens does not cut the output
+off (unless the budget is smaller than the shortest valid output).
+
+Supported schema parts: objects (all properties emitted), arrays, strings with maxLength, and
+string enums (Literal), which is everything the detection and refactoring schemas use. Any other
+part is rejected with a ValueError naming its path in the schema (e.g. `#/properties/x/items`).
+"""
+import torch
+from transformers import LogitsProcessor
+
+LEADING_WHITESPACE = 2
+_STATE_CACHE_SIZE = 4096
+_token_tables = {}
+
+
+class SchemaGrammar:
+    """Character-level automaton over a JSON schema. States are immutable tuples of frames."""
+
+    def __init__(self, schema):
+        self.defs = schema.get("$defs", {})
+        self.nodes = []
+        self.root = self._compile(schema)
+
+    def _resolve(self, schema, path):
+        while "$ref" in schema:
+            name = schema["$ref"].split("/")[-1]
+            if name not in self.defs:
+                raise ValueError(f"Unresolved $ref {schema['$ref']!r} at {path}")
+            schema = self.defs[name]
+        return schema
+
+    def _compile(self, schema, path="#"):
+        schema = self._resolve(schema, path)
+        node_id = len(self.nodes)
+        self.nodes.append(None)
+        if "enum" in schema:
+            node = ("enum", tuple(schema["enum"]))
+        elif schema.get("type") == "object":
+            props = [(key, self._compile(value, f"{path}/properties/{key}"))
+                     for key, value in schema.get("properties", {}).items()]
+            # Frames are popped from the end: `"k0": ` v0 `, "k1": ` v1 ... `}`
+            frames = [("lit", "}", 0)]
+            for i, (key, value) in reversed(list(enumerate(props))):
+                frames += [("value", value), ("lit", f'{", " if i else ""}"{key}": ', 0)]
+            node = ("object", tuple(frames))
+        elif schema.get("type") == "array":
+            node = ("array", self._compile(schema.get("items", {}), f"{path}/items"))
+        elif schema.get("type") == "string":
+            node = ("string", schema.get("maxLength", float("inf")))
+        else:
+            raise ValueError(f"Unsupported schema part at {path}: {schema}")
+        self.nodes[node_id] = node
+        return node_id
+
+    def initial_state(self):
+        return (("value", self.root), ("ws", LEADING_WHITESPACE))
+
+    def _start_value(self, rest, node_id, ch):
+        kind, arg = self.nodes[node_id]
+        if kind == "object":
+            return rest + arg if ch == "{" else None
+        if kind == "array":
+            return rest + (("arr", node_id, "open"),) if ch == "[" else None
+        if kind == "string":
+            return rest + (("str", arg, 0, 0),) if ch == '"' else None
+        if kind == "enum":
+            return rest + (("enum", node_id, ""),) if ch == '"' else None
+        return None
+
+    def step(self, state, ch):
+        """State after emitting `ch`, or None if `ch` is not allowed"""
+        if not state:
+            return None
+        top, rest = state[-1], state[:-1]
+        kind = top[0]
+        if kind == "lit":
+            _, text, pos = top
+            if text[pos] != ch:
+                return None
+            return rest + (("lit", text, pos + 1),) if pos + 1 < len(text) else rest
+        if kind == "str":
+            _, max_len, count, escape = top
+            if escape == 0:
+                if ch == '"':
+                    return rest
+                if ch < " " or count >= max_len:
+                    return None
+                return rest + (("str", max_len, count + 1, 1 if ch == "\\" else 0),)
+            if escape == 1:
+                if ch == "u":
+                    return rest + (("str", max_len, count, 2),)
+                return rest + (("str", max_len, count, 0),) if ch in '"\\/bfnrt' else None
+            if ch not in "0123456789abcdefABCDEF":
+                return None
+            return rest + (("str", max_len, count, escape + 1 if escape < 5 else 0),)
+        if kind == "enum":
+            _, node_id, prefix = top
+            values = self.nodes[node_id][1]
+            if ch == '"' and prefix in values:
+                return rest
+            candidate = prefix + ch
+            return rest + (("enum", node_id, candidate),) if any(v.startswith(candidate) for v in values) else None
+        if kind == "arr":
+            _, node_id, phase = top
+            item = self.nodes[node_id][1]
+            if ch == "]":
+                return rest
+            if phase == "open":
+                return self._start_value(rest + (("arr", node_id, "next"),), item, ch)
+            if ch == ",":
+                return rest + (("arr", node_id, "next"), ("value", item), ("lit", " ", 0))
+            return None
+        if kind == "value":
+            return self._start_value(rest, top[1], ch)
+        if kind == "ws":
+            if ch in " \n" and top[1] > 0:
+                return rest + (("ws", top[1] - 1),)
+            return self.step(rest, ch)
+        return None
+
+    def _min_value(self, node_id):
+        kind, arg = self.nodes[node_id]
+        if kind == "object":
+            return "{" + self.closing_text(arg)
+        if kind == "array":
+            return "[]"
+        if kind == "enum":
+            return '"' + min(arg, key=len) + '"'
+        return '""'
+
+    def closing_text(self, state):
+        """Shortest text that completes the JSON from `state`"""
+        parts = []
+        for frame in reversed(state):
+            kind = frame[0]
+            if kind == "lit":
+                parts.append(frame[1][frame[2]:])
+            elif kind == "str":
+                escape = frame[3]
+                parts.append(("n" if escape == 1 else "0" * (6 - escape) if escape else "") + '"')
+            elif kind == "enum":
+                values = [v for v in self.nodes[frame[1]][1] if v.startswith(frame[2])]
+                parts.append(min(values, key=len)[len(frame[2]):] + '"')
+            elif kind == "arr":
+                parts.append("]")
+            elif kind == "value":
+                parts.append(self._min_value(frame[1]))
+        return "".join(parts)
+
+    def advance(self, state, text):
+        for ch in text:
+            state = self.step(state, ch)
+            if state is None:
+                return None
+        return state
+
+    @staticmethod
+    def is_complete(state):
+        return state == ()
+
+
+class _TrieNode:
+    __slots__ = ("children", "token_ids")
+
+    def __init__(self):
+        self.children = {}
+        self.token_ids = []
+
+
+class TokenTable:
+    """Decoded text of every token, arranged for fast masking"""
+
+    def __init__(self, tokenizer, vocab_size):
+        self.vocab_size = vocab_size
+        self.eos_token_id = tokenizer.eos_token_id
+        special = set(tokenizer.all_special_ids)
+        self.texts = {}
+        for token_id in range(len(tokenizer)):
+            if token_id in special:
+                continue
+            text = tokenizer.decode([token_id])
+            piece = tokenizer.convert_ids_to_tokens(token_id)
+            if isinstance(piece, str) and piece.startswith("▁") and not text.startswith(" "):
+                text = " " + text  # SentencePiece drops the word-boundary space when decoding one token
+            # Tokens holding part of a multi-byte character can't be checked character by character
+            if text and "�" not in text:
+                self.texts[token_id] = text
+
+        self.trie = self._build_trie(self.texts.items())
+        # Plain tokens can appear anywhere inside a JSON string; only their length matters there
+        plain = {tid: text for tid, text in self.texts.items()
+                 if '"' not in text and "\\" not in text and all(ch >= " " for ch in text)}
+        self.plain_mask = torch.zeros(vocab_size, dtype=torch.bool)
+        self.plain_lengths = torch.zeros(vocab_size, dtype=torch.long)
+        for tid, text in plain.items():
+            if tid < vocab_size:
+                self.plain_mask[tid] = True
+                self.plain_lengths[tid] = len(text)
+        self.string_trie = self._build_trie((tid, t) for tid, t in self.texts.items() if tid not in plain)
+
+    @staticmethod
+    def _build_trie(items):
+        root = _TrieNode()
+        for token_id, text in items:
+            node = root
+            for ch in text:
+                node = node.children.setdefault(ch, _TrieNode())
+            node.token_ids.append(token_id)
+        return root
+
+
+def token_table(tokenizer, vocab_size):
+    key = (id(tokenizer), vocab_size)
+    if key not in _token_tables:
+        _token_tables[key] = TokenTable(tokenizer, vocab_size)
+    return _token_tables[key]
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    """Restricts every row of a generate() call to JSON matching `schema_model`"""
+
+    def __init__(self, tokenizer, schema_model, max_new_tokens=None):
+        self.tokenizer = tokenizer
+        self.grammar = SchemaGrammar(schema_model.model_json_schema())
+        self.max_new_tokens = max_new_tokens
+        self.vocab_size = None
+        self.table = None
+        self.states = None
+        self.prompt_len = None
+        self._allowed_cache = {}
+
+    def _allowed(self, state, budget=None):
+        """
+        Returns (mask of allowed tokens, longest closing text left after any of them). With a
+        `budget`, only tokens whose closing text is at most `budget` characters are allowed.
+        """
+        cached = self._allowed_cache.get(state) if budget is None else None
+        if cached is not None:
+            return cached
+
+        mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+        top = state[-1]
+        in_free_string = top[0] == "str" and top[3] == 0
+        longest = 0
+        if in_free_string:
+            # Plain text inside a string leaves the closing text as it is
+            closing = len(self.grammar.closing_text(state))
+            if budget is None or closing <= budget:
+                mask |= self.table.plain_mask & (self.table.plain_lengths <= top[1] - top[2])
+                longest = closing
+        trie = self.table.string_trie if in_free_string else self.table.trie
+        stack = [(trie, state)]
+        while stack:
+            node, node_state = stack.pop()
+            for ch, child in node.children.items():
+                child_state = self.grammar.step(node_state, ch)
+                if child_state is None:
+                    continue
+                if child.token_ids:
+                    closing = len(self.grammar.closing_text(child_state))
+                    if budget is None or closing <= budget:
+                        longest = max(longest, closing)
+                        for token_id in child.token_ids:
+                            if token_id < self.vocab_size:
+                                mask[token_id] = True
+                if child.children:
+                    stack.append((child, child_state))
+
+        # Free-string states rarely repeat, so only structural states are worth caching
+        if budget is None and not in_free_string and len(self._allowed_cache) < _STATE_CACHE_SIZE:
+            self._allowed_cache[state] = (mask, longest)
+        return mask, longest
+
+    def _closing(self, text):
+        """Tokens that spell a prefix of `text`, the fallback when nothing fits the budget"""
+        mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+        node = self.table.trie
+        for ch in text:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            for token_id in node.token_ids:
+                if token_id < self.vocab_size:
+                    mask[token_id] = True
+        return mask
+
+    def _row_mask(self, state, tokens_left):
+        if state is None or self.grammar.is_complete(state):
+            mask = torch.zeros(self.vocab_size, dtype=torch.bool)
+            mask[self.table.eos_token_id] = True
+            return mask
+        mask, longest = self._allowed(state)
+        if tokens_left is not None and longest >= tokens_left:
+            # Worst case every remaining character needs a token of its own
+            mask, _ = self._allowed(state, tokens_left - 1)
+            if not mask.any():
+                mask = self._closing(self.grammar.closing_text(state))
+        return mask
+
+    def __call__(self, input_ids, scores):
+        if self.states is None:
+            self.vocab_size = scores.shape[-1]
+            self.table = token_table(self.tokenizer, self.vocab_size)
+            self.states = [self.grammar.initial_state()] * input_ids.shape[0]
+            self.prompt_len = input_ids.shape[1]
+        elif input_ids.shape[1] > self.prompt_len:
+            for row, token_id in enumerate(input_ids[:, -1].tolist()):
+                state = self.states[row]
+                if state is not None and not self.grammar.is_complete(state):
+                    self.states[row] = self.grammar.advance(state, self.table.texts.get(token_id, "\0"))
+
+        tokens_left = self.max_new_tokens - (input_ids.shape[1] - self.prompt_len) if self.max_new_tokens else None
+        allowed = torch.stack([self._row_mask(state, tokens_left) for state in self.states]).to(scores.device)
+        return scores.masked_fill(~allowed, float("-inf"))
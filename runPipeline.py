@@ -0,0 +1,341 @@
+#! /usr/bin/env python3
+"""
+Make-style runner for the dataset and labelling pipeline.
+
+Every script is a stage with declared inputs, outputs and config keys. A stage is skipped when
+the hashes of its inputs, its config and its source files match the last successful run and its
+outputs are still as that run left them. Stages whose dependencies are done run concurrently.
+
+    python runPipeline.py                          # metadata -> dependencies -> chunks
+    python runPipeline.py label_coupling.medium    # plus everything it needs
+    python runPipeline.py refactor_solid --set label_workers=4
+    python runPipeline.py --list
+
+Labelling and refactoring stages call the Gemini API, so they only run when asked for by name
+(or with `all`). They are incremental: their outputs are never cleared, and a rerun only labels the
+chunks missing from the output (failed ones included). Their key holds only what changes the labels
+(inputs and settings such as `prefilter`), not throughput settings or script edits; delete an output
+file to relabel it from scratch. Diff stages run when `previous_chunks_dir` is set.
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, "DatasetPreparation")
+LABELLING_DIR = os.path.join(BASE_DIR, "DataLableling")
+sys.path.append(DATASET_DIR)
+sys.path.append(LABELLING_DIR)
+
+from javaFileIndex import VCS_DIRS
+
+DEFAULT_CONFIG = {
+    "raw_dir": "miniDataset",
+    "work_dir": "pipelineOutput",
+    "previous_chunks_dir": None,
+    "size_classes": ["small", "medium", "large"],
+    "workers": 1,
+    "first_project_id": 133,
+    "prefilter": True,
+    "label_workers": 8,
+    "tokens_per_minute": 1_000_000,
+}
+STATE_FILE = ".pipelineState.json"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class Stage:
+    def __init__(self, name, run, inputs, outputs, config_keys=(), sources=(), default=True, incremental=False):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config_keys = list(config_keys)
+        self.sources = [os.path.join(BASE_DIR, s) for s in sources]
+        self.default = default
+        # Incremental stages resume into their outputs instead of rebuilding them
+        self.incremental = incremental
+
+
+class FileHasher:
+    """sha256 of files and `*.java` trees, memoised on (size, mtime_ns) across runs"""
+
+    def __init__(self, memo=None):
+        self.memo = memo if memo is not None else {}
+        self._lock = threading.Lock()
+
+    def file_hash(self, path):
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self.memo.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self.memo[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def tree_hash(self, root):
+        h = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in VCS_DIRS)
+            for name in sorted(filenames):
+                if name.endswith(".java"):
+                    path = os.path.join(dirpath, name)
+                    h.update(f"{os.path.relpath(path, root)}\0{self.file_hash(path)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def path_hash(self, path):
+        if os.path.isdir(path):
+            return self.tree_hash(path)
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        return None
+
+
+def build_stages(config):
+    """The pipeline DAG for `config`. Paths are derived from `work_dir` so runs never collide."""
+    work = config["work_dir"]
+    cleaned_dir = os.path.join(work, "cleaned")
+    metadata_file = os.path.join(work, "metadata.json")
+    dependency_file = os.path.join(work, "dependencies.json")
+    chunks_dir = os.path.join(work, "chunks")
+    chunk_files = {size: os.path.join(chunks_dir, f"{size}.jsonl") for size in DEFAULT_CONFIG["size_classes"]}
+
+    def metadata():
+        import generateMetadata
+        generateMetadata.process_projects(config["raw_dir"], cleaned_dir, metadata_file, config["workers"])
+
+    def dependencies():
+        import generateInputJson
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            generateInputJson.load_dependencies(json.load(f), cleaned_dir, dependency_file)
+
+    def chunks():
+        import generateInputJson
+        os.makedirs(chunks_dir, exist_ok=True)
+        with open(metadata_file, "r", encoding="utf-8") as f:
+            generateInputJson.process_projects(json.load(f), cleaned_dir, dependency_file, chunks_dir,
+                                               config["first_project_id"])
+
+    stages = [
+        Stage("metadata", metadata, [config["raw_dir"]], [cleaned_dir, metadata_file],
+              ["raw_dir"], ["DatasetPreparation/generateMetadata.py"]),
+        Stage("dependencies", dependencies, [metadata_file, cleaned_dir], [dependency_file], [],
+              ["DatasetPreparation/generateInputJson.py", "DatasetPreparation/javaParserService.py"]),
+        Stage("chunks", chunks, [metadata_file, cleaned_dir, dependency_file], list(chunk_files.values()),
+              ["first_project_id"], ["DatasetPreparation/generateInputJson.py", "DatasetPreparation/tokenEstimator.py"]),
+    ]
+
+    for size in config["size_classes"]:
+        chunk_file = chunk_files[size]
+        labelled = {task: os.path.join(work, "labelled", f"{size}{task}.jsonl") for task in ("Solid", "Coupling")}
+        reruns = {task: os.path.join(work, "labelled", f"{size}{task}Rerun.jsonl") for task in ("Solid", "Coupling")}
+
+        if config["previous_chunks_dir"]:
+            old_file = os.path.join(config["previous_chunks_dir"], f"{size}.jsonl")
+            diff_file = os.path.join(work, "diffs", f"{size}.jsonl")
+            def diff(old_file=old_file, chunk_file=chunk_file, diff_file=diff_file):
+                from GetDiffs import compare_and_save
+                compare_and_save(old_file, chunk_file, diff_file)
+            stages.append(Stage(f"diffs.{size}", diff, [old_file, chunk_file], [diff_file], [],
+                                ["DatasetPreparation/GetDiffs.py"]))
+
+        def label_solid(chunk_file=chunk_file, out=labelled["Solid"], rerun=reruns["Solid"]):
+            from labellingDetection import detect_solid_violations_scheduled
+            detect_solid_violations_scheduled(chunk_file, out, rerun, workers=config["label_workers"],
+                                              tokens_per_minute=config["tokens_per_minute"])
+
+        def label_coupling(chunk_file=chunk_file, out=labelled["Coupling"], rerun=reruns["Coupling"]):
+            from labellingDetection import detect_coupling_scheduled
+            detect_coupling_scheduled(chunk_file, out, rerun, prefilter=config["prefilter"],
+                                      workers=config["label_workers"], tokens_per_minute=config["tokens_per_minute"])
+
+        stages.append(Stage(f"label_solid.{size}", label_solid, [chunk_file], [labelled["Solid"], reruns["Solid"]],
+                            default=False, incremental=True))
+        stages.append(Stage(f"label_coupling.{size}", label_coupling, [chunk_file],
+                            [labelled["Coupling"], reruns["Coupling"]], ["prefilter"], default=False, incremental=True))
+
+        for task, refactor_name in (("Solid", "refactor_solid_violations_pipelined"),
+                                    ("Coupling", "refactor_coupling_smells_pipelined")):
+            out = os.path.join(work, "refactored", f"{size}{task}.jsonl")
+            rerun = os.path.join(work, "refactored", f"{size}{task}Rerun.jsonl")
+            def refactor(source=labelled[task], out=out, rerun=rerun, refactor_name=refactor_name):
+                import labellingRefactoring
+                getattr(labellingRefactoring, refactor_name)(source, out, rerun, call_workers=config["label_workers"])
+            stages.append(Stage(f"refactor_{task.lower()}.{size}", refactor, [labelled[task]], [out, rerun],
+                                default=False, incremental=True))
+    return stages
+
+
+class Runner:
+    def __init__(self, config, stages, force=False, dry_run=False, jobs=4):
+        self.config = config
+        self.stages = {s.name: s for s in stages}
+        self.force = force
+        self.dry_run = dry_run
+        self.jobs = jobs
+        self.state_path = os.path.join(config["work_dir"], STATE_FILE)
+        self.state = self._load_state()
+        self.hasher = FileHasher(self.state.setdefault("file_hashes", {}))
+        self._state_lock = threading.Lock()
+        # Stage producing each path, so inputs resolve to upstream stages
+        self.producer = {os.path.normpath(out): s.name for s in stages for out in s.outputs}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.config["work_dir"], exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def upstream(self, stage):
+        return sorted({self.producer[os.path.normpath(p)] for p in stage.inputs
+                       if os.path.normpath(p) in self.producer})
+
+    def select(self, targets):
+        """Targets (stage names or name prefixes such as `label_coupling`) plus all their upstream stages"""
+        if not targets:
+            wanted = [name for name, s in self.stages.items() if s.default]
+        elif "all" in targets:
+            wanted = list(self.stages)
+        else:
+            wanted = []
+            for target in targets:
+                matches = [name for name in self.stages if name == target or name.startswith(f"{target}.")]
+                if not matches:
+                    raise SystemExit(f"Unknown stage: {target}")
+                wanted += matches
+        selected, pending = set(), list(wanted)
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending += self.upstream(self.stages[name])
+        return [name for name in self.stages if name in selected]
+
+    def stage_key(self, stage):
+        h = hashlib.sha256(stage.name.encode("utf-8"))
+        h.update(json.dumps({k: self.config[k] for k in stage.config_keys}, sort_keys=True).encode("utf-8"))
+        for path in stage.inputs + stage.sources:
+            h.update(f"{path}\0{self.hasher.path_hash(path)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def outputs_fingerprint(self, stage):
+        return {path: self.hasher.path_hash(path) for path in stage.outputs}
+
+    def is_up_to_date(self, stage, key):
+        record = self.state.get("stages", {}).get(stage.name)
+        return (not self.force and record is not None and record["key"] == key
+                and None not in record["outputs"].values()
+                and record["outputs"] == self.outputs_fingerprint(stage))
+
+    def run_stage(self, name):
+        stage = self.stages[name]
+        key = self.stage_key(stage)
+        if self.is_up_to_date(stage, key):
+            print(f"[{name}] up to date")
+            return "skipped"
+        if self.dry_run:
+            print(f"[{name}] would run")
+            return "ran"
+        # A stage owns its outputs; the scripts append, so stale ones are cleared first. Paid
+        # labelling outputs are kept: those stages skip chunks that are already labelled.
+        for path in stage.outputs:
+            if not stage.incremental:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        print(f"[{name}] running")
+        stage.run()
+        for path in stage.outputs:
+            # Labelling stages only write a rerun file when something failed
+            if not os.path.exists(path) and path.endswith(".jsonl"):
+                open(path, "a").close()
+        with self._state_lock:
+            self.state.setdefault("stages", {})[name] = {"key": key, "outputs": self.outputs_fingerprint(stage)}
+            self._save_state()
+        print(f"[{name}] done")
+        return "ran"
+
+    def run(self, targets=None):
+        order = self.select(targets)
+        deps = {name: [d for d in self.upstream(self.stages[name]) if d in order] for name in order}
+        status, running = {}, {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while len(status) < len(order):
+                for name in order:
+                    if name in status or name in running.values():
+                        continue
+                    if any(status.get(d) == "failed" or status.get(d) == "blocked" for d in deps[name]):
+                        status[name] = "blocked"
+                        print(f"[{name}] blocked by a failed dependency")
+                    elif all(d in status for d in deps[name]):
+                        running[pool.submit(self.run_stage, name)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as e:
+                        print(f"[{name}] failed: {type(e).__name__}: {e}")
+                        status[name] = "failed"
+        return status
+
+
+def load_config(config_file=None, overrides=()):
+    config = dict(DEFAULT_CONFIG)
+    if config_file:
+        with open(config_file, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    for item in overrides:
+        key, _, value = item.partition("=")
+        if key not in DEFAULT_CONFIG:
+            raise SystemExit(f"Unknown config key: {key}")
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date.")
+    parser.add_argument("targets", nargs="*", help="Stage names or prefixes; `all` includes labelling.")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG.")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Override one config key.")
+    parser.add_argument("--force", action="store_true", help="Rerun selected stages even if up to date.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run.")
+    parser.add_argument("--jobs", type=int, default=4, help="Stages to run concurrently.")
+    parser.add_argument("--list", action="store_true", help="List stages and their dependencies.")
+    args = parser.parse_args()
+
+    config = load_config(args.config, args.set)
+    runner = Runner(config, build_stages(config), args.force, args.dry_run, args.jobs)
+    if args.list:
+        for name, stage in runner.stages.items():
+            print(f"{name:<28} <- {', '.join(runner.upstream(stage)) or '-'}{'' if stage.default else '  (on request)'}")
+        sys.exit(0)
+    status = runner.run(args.targets)
+    sys.exit(1 if any(s in ("failed", "blocked") for s in status.values()) else 0)